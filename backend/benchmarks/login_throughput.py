@@ -0,0 +1,117 @@
+"""
+Measure login throughput and what in-flight logins do to other requests.
+
+    python -m backend.benchmarks.login_throughput --logins 40 --concurrency 20
+
+A temporary SQLite database is seeded with staff accounts and the app is
+driven in-process over ASGI. For each mode ``--concurrency`` clients log in
+until ``--logins`` have succeeded while a probe requests ``GET /`` every
+10 ms. "inline" hashes on the event loop, as the API used to; "pool" uses
+the bcrypt thread pool. Reported are logins/s and the probe's latency.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+USERS = 20
+PASSWORD = "Benchmark123"
+
+
+def seed(engine, Base, User, pwd_context):
+    from sqlalchemy.orm import Session
+
+    Base.metadata.create_all(bind=engine)
+    hashed = pwd_context.hash(PASSWORD)
+    with Session(engine) as db:
+        db.add_all([
+            User(email=f"staff{i}@example.com", name=f"Staff {i}", hashed_password=hashed, role="cook")
+            for i in range(USERS)
+        ])
+        db.commit()
+
+
+async def run_mode(app, async_engine, password_hasher, workers, logins, concurrency):
+    import httpx
+
+    password_hasher.shutdown()
+    password_hasher.workers = workers
+    password_hasher.completed = 0
+
+    # Open the first pooled connection before the clients race for it
+    async with async_engine.connect():
+        pass
+
+    latencies = []
+    remaining = [logins]
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(app=app, base_url="http://benchmark") as client:
+        async def login(n):
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                response = await client.post("/token", data={"username": f"staff{n % USERS}@example.com", "password": PASSWORD})
+                assert response.status_code == 200, response.text
+
+        async def probe():
+            # Latency counts from when the probe was due, so time spent waiting
+            # for a blocked event loop to wake it up is included
+            due = time.perf_counter()
+            while not done.is_set():
+                await client.get("/")
+                finished = time.perf_counter()
+                latencies.append((finished - due) * 1000)
+                due = finished + 0.01
+                await asyncio.sleep(0.01)
+
+        probe_task = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(login(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+    # Pooled connections belong to this event loop
+    await async_engine.dispose()
+
+    latencies.sort()
+    return {
+        "logins_per_s": logins / elapsed,
+        "probe_p50_ms": statistics.median(latencies),
+        "probe_p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "probe_max_ms": latencies[-1],
+        "probes": len(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4, help="bcrypt threads in pool mode")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The app reads DATABASE_URL when it is imported
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'logins.db')}"
+        from ..database import async_engine, engine
+        from ..main import app
+        from ..models.models import Base, User
+        from ..utils.passwords import password_hasher, pwd_context
+
+        seed(engine, Base, User, pwd_context)
+
+        print(f"{'mode':<8} {'logins/s':>9} {'probe p50':>10} {'probe p99':>10} {'probe max':>10} {'probes':>7}")
+        for mode, workers in (("inline", 0), ("pool", args.workers)):
+            result = asyncio.run(run_mode(app, async_engine, password_hasher, workers, args.logins, args.concurrency))
+            print(
+                f"{mode:<8} {result['logins_per_s']:>9.1f} {result['probe_p50_ms']:>8.1f}ms "
+                f"{result['probe_p99_ms']:>8.1f}ms {result['probe_max_ms']:>8.1f}ms {result['probes']:>7}"
+            )
+        password_hasher.shutdown()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
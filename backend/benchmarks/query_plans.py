@@ -0,0 +1,176 @@
+"""
+Check that the hot query shapes are answered from their indexes.
+
+    python -m backend.benchmarks.query_plans
+    python -m backend.benchmarks.query_plans --database-url sqlite:///backend/kindergarten_meals.db
+
+Without --database-url a temporary SQLite database is built from the models
+and seeded. Pointing it at a database upgraded with ``alembic upgrade head``
+checks that the migrations created the same indexes. Each query is run
+through EXPLAIN and the script exits non-zero if a plan does not use the
+expected index.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import Session
+
+from ..models.models import (
+    AlertKind, Base, Ingredient, IngredientDelivery, Meal, MealIngredient, MealServing,
+    Notification, Order, OrderStatus, User
+)
+from ..utils.notification_reads import unread_broadcasts
+from ..utils.pagination import encode_cursor, keyset_page
+
+MONTH_START = datetime(2025, 5, 1)
+MONTH_END = datetime(2025, 6, 1)
+
+# (description, statement, index expected in the plan)
+HOT_QUERIES = [
+    (
+        "monthly report: servings in a date range, portions per meal",
+        select(MealServing.meal_id, func.sum(MealServing.portions))
+        .where(MealServing.serving_date >= MONTH_START, MealServing.serving_date < MONTH_END)
+        .group_by(MealServing.meal_id),
+        "ix_meal_servings_date_meal_portions",
+    ),
+    (
+        "unread notifications for a user, newest first",
+        select(Notification)
+        .where(Notification.user_id == 1, Notification.is_read == False)
+        .order_by(Notification.created_at.desc()),
+        "ix_notifications_user_read_created",
+    ),
+    (
+        "recipe rows for a set of meals",
+        select(MealIngredient.meal_id, MealIngredient.ingredient_id, MealIngredient.quantity)
+        .where(MealIngredient.meal_id.in_([1, 2, 3])),
+        "ix_meal_ingredients_meal_ingredient_qty",
+    ),
+    (
+        "deliveries of an ingredient since a date",
+        select(IngredientDelivery)
+        .where(IngredientDelivery.ingredient_id == 1, IngredientDelivery.delivery_date >= MONTH_START),
+        "ix_ingredient_deliveries_ingredient_date",
+    ),
+    (
+        "orders by status, oldest first",
+        select(Order).where(Order.status == OrderStatus.PENDING.value).order_by(Order.created_at),
+        "ix_orders_status_created_at",
+    ),
+    (
+        "keyset page of meal servings after a cursor",
+        keyset_page(select(MealServing), MealServing, encode_cursor(MONTH_START, 100), 100),
+        "ix_meal_servings_created_at_id",
+    ),
+    (
+        "keyset page of a user's notifications, newest first",
+        keyset_page(select(Notification).where(Notification.user_id == 1), Notification, encode_cursor(MONTH_START, 100), 100, descending=True),
+        "ix_notifications_user_created_id",
+    ),
+    (
+        "low-stock job: broadcast alert of a kind for an ingredient",
+        select(Notification.id).where(
+            Notification.user_id.is_(None),
+            Notification.ingredient_id == 1,
+            Notification.alert_kind == AlertKind.LOW_STOCK.value,
+            Notification.is_read == False,
+        ),
+        "ix_notifications_unread_alerts",
+    ),
+    (
+        "broadcasts a user has not read: ids above their watermark",
+        select(Notification.id).where(unread_broadcasts(1)),
+        "ix_notifications_user_id_id",
+    ),
+]
+
+
+def seed(engine):
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        users = [User(email=f"user{i}@example.com", name=f"User {i}", role="cook") for i in range(10)]
+        ingredients = [Ingredient(name=f"Ingredient {i}", quantity=100.0, unit="kg", threshold=5.0) for i in range(50)]
+        meals = [Meal(name=f"Meal {i}", description="Seeded meal") for i in range(50)]
+        db.add_all(users + ingredients + meals)
+        db.flush()
+
+        start = datetime(2025, 1, 1)
+        db.add_all([
+            MealIngredient(meal_id=meal.id, ingredient_id=ingredients[(n + k) % 50].id, quantity=0.1)
+            for n, meal in enumerate(meals) for k in range(8)
+        ])
+        db.add_all([
+            MealServing(meal_id=meals[i % 50].id, portions=10, serving_date=start + timedelta(hours=i), user_id=users[i % 10].id)
+            for i in range(5000)
+        ])
+        db.add_all([
+            Notification(user_id=users[i % 10].id, message=f"Notification {i}", is_read=i % 3 == 0, created_at=start + timedelta(hours=i))
+            for i in range(5000)
+        ])
+        db.add_all([
+            Notification(
+                user_id=None, message=f"Stock alert {i}", created_at=start + timedelta(hours=i),
+                ingredient_id=ingredients[i % 50].id, alert_kind=AlertKind.LOW_STOCK.value,
+            )
+            for i in range(1000)
+        ])
+        db.add_all([
+            IngredientDelivery(ingredient_id=ingredients[i % 50].id, quantity=10.0, delivery_date=start + timedelta(days=i % 365), user_id=users[0].id)
+            for i in range(2000)
+        ])
+        db.add_all([
+            Order(ingredient_id=ingredients[i % 50].id, quantity=5.0, status=list(OrderStatus)[i % 4].value, created_at=start + timedelta(hours=i), created_by=users[0].id)
+            for i in range(2000)
+        ])
+        db.commit()
+
+
+def explain(connection, statement):
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if connection.dialect.name == "sqlite" else "EXPLAIN "
+    return "\n".join(" ".join(str(col) for col in row) for row in connection.execute(text(prefix + sql)))
+
+
+def check(engine):
+    failures = 0
+    with engine.connect() as connection:
+        if connection.dialect.name == "sqlite":
+            connection.execute(text("ANALYZE"))
+        elif connection.dialect.name == "postgresql":
+            # Tiny test tables would otherwise always be scanned sequentially
+            connection.execute(text("SET enable_seqscan = off"))
+
+        for description, statement, index_name in HOT_QUERIES:
+            plan = explain(connection, statement)
+            ok = index_name in plan
+            failures += not ok
+            print(f"[{'ok' if ok else 'FAIL'}] {description} -> {index_name}")
+            if not ok:
+                print("       " + plan.replace("\n", "\n       "))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", help="check an existing (migrated) database instead of a seeded temporary one")
+    args = parser.parse_args()
+
+    if args.database_url:
+        failures = check(create_engine(args.database_url))
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'plans.db')}")
+            seed(engine)
+            failures = check(engine)
+            engine.dispose()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
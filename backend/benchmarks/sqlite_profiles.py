@@ -0,0 +1,156 @@
+"""
+Compare SQLite connection profiles on a seeded database.
+
+    python -m backend.benchmarks.sqlite_profiles --servings 20000 --seconds 5
+
+Every profile in SQLITE_PROFILES gets a freshly seeded database file and is
+measured for single-row write transactions (one meal serving per commit, as
+the API does), catalog/report reads, and readers running next to a writer,
+which is where rollback-journal mode stalls or fails with "database is locked".
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, joinedload
+
+from ..database import SQLITE_PROFILES, configure_sqlite_engine
+from ..models.models import Base, Ingredient, Meal, MealIngredient, MealServing
+
+INGREDIENTS = 50
+MEALS = 100
+INGREDIENTS_PER_MEAL = 10
+
+
+def make_engine(path, profile):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    configure_sqlite_engine(engine, profile)
+    return engine
+
+
+def seed(engine, servings):
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        ingredients = [
+            Ingredient(name=f"Ingredient {i}", quantity=1_000_000.0, unit="kg", threshold=10.0)
+            for i in range(INGREDIENTS)
+        ]
+        meals = [Meal(name=f"Meal {i}", description="Benchmark meal") for i in range(MEALS)]
+        db.add_all(ingredients + meals)
+        db.flush()
+
+        db.add_all([
+            MealIngredient(meal_id=meal.id, ingredient_id=ingredients[(n + k) % INGREDIENTS].id, quantity=0.1)
+            for n, meal in enumerate(meals)
+            for k in range(INGREDIENTS_PER_MEAL)
+        ])
+        start = datetime(2025, 1, 1, 8, 0)
+        db.add_all([
+            MealServing(meal_id=meals[i % MEALS].id, portions=10, serving_date=start + timedelta(minutes=i), user_id=1)
+            for i in range(servings)
+        ])
+        db.commit()
+
+
+def read_once(db):
+    """The catalog query behind GET /meals/ plus a monthly serving aggregate."""
+    db.execute(
+        select(Meal).options(joinedload(Meal.meal_ingredients).joinedload(MealIngredient.ingredient))
+    ).unique().all()
+    db.execute(
+        select(func.sum(MealServing.portions)).where(
+            MealServing.serving_date >= datetime(2025, 1, 1),
+            MealServing.serving_date < datetime(2025, 2, 1)
+        )
+    ).scalar()
+
+
+def write_once(db):
+    """One serving: insert the row and deduct stock in a single transaction."""
+    db.add(MealServing(meal_id=1, portions=1, serving_date=datetime.utcnow(), user_id=1))
+    db.execute(
+        update(Ingredient)
+        .where(Ingredient.id <= INGREDIENTS_PER_MEAL)
+        .values(quantity=Ingredient.quantity - 0.1)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def run_for(seconds, fn):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        fn()
+        count += 1
+    return count / seconds
+
+
+def bench_serial(engine, seconds):
+    with Session(engine) as db:
+        reads = run_for(seconds, lambda: read_once(db))
+    with Session(engine) as db:
+        writes = run_for(seconds, lambda: write_once(db))
+    return reads, writes
+
+
+def bench_mixed(engine, seconds, readers):
+    """Readers and one writer sharing the database; counts completed ops and lock errors."""
+    stop = threading.Event()
+    lock = threading.Lock()
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+
+    def loop(op, key):
+        with Session(engine) as db:
+            while not stop.is_set():
+                try:
+                    op(db)
+                except OperationalError:
+                    db.rollback()
+                    with lock:
+                        counts["locked"] += 1
+                    continue
+                with lock:
+                    counts[key] += 1
+
+    threads = [threading.Thread(target=loop, args=(read_once, "reads")) for _ in range(readers)]
+    threads.append(threading.Thread(target=loop, args=(write_once, "writes")))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return counts["reads"] / seconds, counts["writes"] / seconds, counts["locked"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--servings", type=int, default=20000, help="meal_servings rows to seed")
+    parser.add_argument("--seconds", type=float, default=3.0, help="duration of each measurement")
+    parser.add_argument("--readers", type=int, default=4, help="reader threads in the mixed run")
+    parser.add_argument("--profiles", nargs="+", default=list(SQLITE_PROFILES), choices=list(SQLITE_PROFILES))
+    args = parser.parse_args()
+
+    print(f"{'profile':<10} {'reads/s':>10} {'writes/s':>10} {'mixed reads/s':>14} {'mixed writes/s':>15} {'locked':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in args.profiles:
+            path = os.path.join(tmp, f"{profile}.db")
+            engine = make_engine(path, profile)
+            seed(engine, args.servings)
+
+            reads, writes = bench_serial(engine, args.seconds)
+            mixed_reads, mixed_writes, locked = bench_mixed(engine, args.seconds, args.readers)
+            engine.dispose()
+
+            print(f"{profile:<10} {reads:>10.1f} {writes:>10.1f} {mixed_reads:>14.1f} {mixed_writes:>15.1f} {locked:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,113 +1,185 @@
 from celery import Celery
-from sqlalchemy import create_engine, func
-from sqlalchemy.orm import sessionmaker
-from main import Ingredient, Meal, MealIngredient, MealServing, MonthlyReport
+from celery.schedules import crontab
+from database import SessionLocal
+from notification_archive import archive_notifications
+from models.models import (
+    BROADCAST_TOTAL, AlertKind, Counter, Ingredient, IngredientStatus, Meal, MealServing, Notification,
+    NotificationType, Report
+)
+from sqlalchemy import String, case, cast, exists, false, func, insert, literal, null, select, update
 from datetime import datetime, timedelta
-import asyncio
 import json
 
-# Database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./kindergarten_meals.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# Celery setup
+# Celery setup. Only worker and beat processes import this module; the API
+# app never loads Celery.
 celery_app = Celery(
     "worker",
     broker="redis://localhost:6379/0",
     backend="redis://localhost:6379/0"
 )
 
+celery_app.conf.beat_schedule = {
+    "generate-monthly-report": {
+        "task": "celery_worker.generate_monthly_report",
+        "schedule": crontab(day_of_month=1, hour=0, minute=0),  # Run on the 1st of every month
+    },
+    # The API raises alerts as stock crosses its threshold; this nightly pass
+    # only catches changes made outside it (scripts, manual edits)
+    "check-low-stock-ingredients": {
+        "task": "celery_worker.check_low_stock_ingredients",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "archive-read-notifications": {
+        "task": "celery_worker.archive_read_notifications",
+        "schedule": crontab(hour=3, minute=30),
+    },
+}
+
 @celery_app.task
 def generate_monthly_report():
-    """
-    Generate a monthly report of meal servings and efficiency metrics.
-    This task runs on the 1st of every month.
-    """
     db = SessionLocal()
+    try:
+        # Get data for the previous month
+        now = datetime.utcnow()
+        first_day_of_month = datetime(now.year, now.month, 1)
+        last_month = first_day_of_month - timedelta(days=1)
+        first_day_of_last_month = datetime(last_month.year, last_month.month, 1)
+        
+        # Get meal servings for the previous month
+        meal_servings = db.query(MealServing).filter(
+            MealServing.serving_date >= first_day_of_last_month,
+            MealServing.serving_date < first_day_of_month
+        ).all()
+        
+        # Calculate total portions served
+        total_portions = sum(serving.portions for serving in meal_servings)
+        
+        # Get most popular meals
+        meal_counts = {}
+        for serving in meal_servings:
+            meal = db.query(Meal).filter(Meal.id == serving.meal_id).first()
+            if meal.name in meal_counts:
+                meal_counts[meal.name] += serving.portions
+            else:
+                meal_counts[meal.name] = serving.portions
+        
+        sorted_meals = sorted(meal_counts.items(), key=lambda x: x[1], reverse=True)
+        most_popular_meals = sorted_meals[:5]
+        
+        # Calculate ingredient usage
+        ingredient_usage = {}
+        for serving in meal_servings:
+            meal = db.query(Meal).filter(Meal.id == serving.meal_id).first()
+            for meal_ingredient in meal.meal_ingredients:
+                ingredient = db.query(Ingredient).filter(Ingredient.id == meal_ingredient.ingredient_id).first()
+                used_quantity = meal_ingredient.quantity * serving.portions
+                
+                if ingredient.name in ingredient_usage:
+                    ingredient_usage[ingredient.name] += used_quantity
+                else:
+                    ingredient_usage[ingredient.name] = used_quantity
+        
+        # Generate report content
+        month_name = first_day_of_last_month.strftime("%B %Y")
+        report_title = f"Monthly Report - {month_name}"
+        
+        report_content = {
+            "month": month_name,
+            "total_portions": total_portions,
+            "most_popular_meals": most_popular_meals,
+            "ingredient_usage": ingredient_usage
+        }
+        
+        # Save report to database
+        db_report = Report(
+            title=report_title,
+            content=json.dumps(report_content),
+            report_type="monthly"
+        )
+        db.add(db_report)
+        db.commit()
+        
+        return {"status": "success", "report_id": db_report.id}
     
-    # Get the previous month
-    today = datetime.now()
-    first_day_of_month = datetime(today.year, today.month, 1)
-    last_month = first_day_of_month - timedelta(days=1)
-    first_day_of_last_month = datetime(last_month.year, last_month.month, 1)
-    
-    # Get all meal servings for the previous month
-    servings = db.query(MealServing).filter(
-        MealServing.served_at >= first_day_of_last_month,
-        MealServing.served_at < first_day_of_month
-    ).all()
-    
-    # Calculate total portions served
-    total_portions_served = sum(serving.portions for serving in servings)
-    
-    # Calculate total possible portions
-    # This is a simplified calculation - in a real system, you would need to
-    # track inventory changes over time to calculate this accurately
-    total_possible_portions = total_portions_served * 1.15  # Assuming 15% waste/inefficiency
-    
-    # Calculate discrepancy rate
-    discrepancy_rate = ((total_possible_portions - total_portions_served) / total_possible_portions) * 100
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
     
-    # Create monthly report
-    report = MonthlyReport(
-        month=last_month.month,
-        year=last_month.year,
-        total_portions_served=total_portions_served,
-        total_possible_portions=int(total_possible_portions),
-        discrepancy_rate=discrepancy_rate,
-        generated_at=datetime.now()
+    finally:
+        db.close()
+
+def low_stock_alerts(now: datetime):
+    """
+    INSERT ... SELECT creating one broadcast alert for every low or
+    out-of-stock ingredient that has not had an alert of that kind since its
+    status last changed.
+    """
+    out_of_stock = Ingredient.status == IngredientStatus.OUT_OF_STOCK.value
+    kind = case((out_of_stock, AlertKind.OUT_OF_STOCK.value), else_=AlertKind.LOW_STOCK.value)
+    message = (
+        Ingredient.name + " is " + case((out_of_stock, "out of stock"), else_="low")
+        + ". Current quantity: " + cast(Ingredient.quantity, String) + " " + Ingredient.unit
+    )
+    already_alerted = exists().where(
+        Notification.user_id.is_(None),
+        Notification.ingredient_id == Ingredient.id,
+        Notification.alert_kind == kind,
+        # Always true for broadcasts; lets the partial alert index answer this
+        Notification.is_read == False,
+        # Not updated_at, which every serving moves
+        Notification.created_at >= Ingredient.status_changed_at,
+    )
+    alerts = (
+        select(
+            null(), message, literal(NotificationType.INVENTORY_ALERT.value), false(),
+            literal(now), literal(now), Ingredient.id, kind,
+        )
+        .where(
+            Ingredient.status.in_([IngredientStatus.LOW.value, IngredientStatus.OUT_OF_STOCK.value]),
+            ~already_alerted,
+        )
+    )
+    return insert(Notification).from_select(
+        ["user_id", "message", "notification_type", "is_read", "created_at", "updated_at", "ingredient_id", "alert_kind"],
+        alerts,
     )
-    
-    db.add(report)
-    db.commit()
-    
-    # Close the session
-    db.close()
-    
-    return {
-        "month": last_month.month,
-        "year": last_month.year,
-        "total_portions_served": total_portions_served,
-        "total_possible_portions": int(total_possible_portions),
-        "discrepancy_rate": discrepancy_rate
-    }
 
 @celery_app.task
 def check_low_stock_ingredients():
-    """
-    Check for ingredients that are below their threshold levels.
-    This task runs every 6 hours.
-    """
     db = SessionLocal()
+    try:
+        low_stock_count = db.scalar(
+            select(func.count()).select_from(Ingredient)
+            .where(Ingredient.status.in_([IngredientStatus.LOW.value, IngredientStatus.OUT_OF_STOCK.value]))
+        )
+        # Only the missing alerts are created, in one statement
+        result = db.execute(low_stock_alerts(datetime.utcnow()))
+        # Keep the broadcast count behind /notifications/unread-count in step
+        db.execute(
+            update(Counter)
+            .where(Counter.name == BROADCAST_TOTAL)
+            .values(value=Counter.value + result.rowcount)
+        )
+        db.commit()
+        
+        return {"status": "success", "low_stock_count": low_stock_count, "alerts_created": result.rowcount}
     
-    # Get all ingredients that are below their threshold
-    low_stock_ingredients = db.query(Ingredient).filter(
-        Ingredient.quantity <= Ingredient.threshold
-    ).all()
-    
-    # Create a list of low stock ingredients
-    low_stock_list = [
-        {
-            "id": ingredient.id,
-            "name": ingredient.name,
-            "quantity": ingredient.quantity,
-            "unit": ingredient.unit,
-            "threshold": ingredient.threshold
-        }
-        for ingredient in low_stock_ingredients
-    ]
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
     
-    # Close the session
-    db.close()
+    finally:
+        db.close()
+
+@celery_app.task
+def archive_read_notifications():
+    db = SessionLocal()
+    try:
+        return {"status": "success", **archive_notifications(db)}
     
-    # In a real system, you would send notifications here
-    # For example, send emails, push notifications, etc.
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
     
-    return {
-        "low_stock_count": len(low_stock_list),
-        "low_stock_ingredients": low_stock_list
-    }
+    finally:
+        db.close()
 
 if __name__ == "__main__":
     celery_app.start()
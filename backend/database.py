@@ -1,13 +1,123 @@
-from sqlalchemy import create_engine
+from typing import Optional
+
+from pydantic import BaseSettings
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+
+class DatabaseSettings(BaseSettings):
+    """Database configuration, read from environment variables of the same name."""
+    database_url: str = "sqlite:///./kindergarten_meals.db"
+    # Optional replica for read-only GET endpoints; falls back to database_url
+    database_read_url: Optional[str] = None
+    # Pool sizing for server databases (ignored for SQLite)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    sqlite_profile: str = "tuned"
+
+
+settings = DatabaseSettings()
+
+# Async drivers used by the request handlers
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def normalize_database_url(url: str) -> str:
+    """Accept the common ``postgres://`` spelling, which SQLAlchemy does not."""
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+def get_async_database_url(url: str) -> str:
+    """Map a sync database URL onto its async driver (aiosqlite / asyncpg)."""
+    scheme, sep, rest = url.partition("://")
+    if "+" in scheme or scheme not in ASYNC_DRIVERS:
+        return url
+    return f"{ASYNC_DRIVERS[scheme]}{sep}{rest}"
+
+# SQLite connection profiles, applied as PRAGMAs on every new connection.
+# Select one with SQLITE_PROFILE; "default" leaves SQLite's own settings alone.
+SQLITE_PROFILES = {
+    "default": {},
+    "tuned": {
+        "journal_mode": "WAL",  # readers no longer block behind a writer
+        "synchronous": "NORMAL",  # fsync at checkpoints instead of every commit (safe with WAL)
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64000,  # in KiB, i.e. 64 MB of page cache per connection
+        "busy_timeout": 5000,  # wait up to 5 s for a lock instead of "database is locked"
+        "temp_store": "MEMORY",
+    },
+}
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas: dict):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def configure_sqlite_engine(engine, profile: Optional[str] = None):
+    """Apply a SQLite profile to every connection the engine opens. No-op for other databases."""
+    if engine.dialect.name != "sqlite":
+        return
+    profile = profile or settings.sqlite_profile
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile {profile!r}, expected one of {sorted(SQLITE_PROFILES)}")
+
+    pragmas = SQLITE_PROFILES[profile]
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+def engine_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": True,
+    }
+
+def create_db_engine(url: str):
+    """Sync engine for Celery tasks and scripts."""
+    url = normalize_database_url(url)
+    engine = create_engine(url, **engine_options(url))
+    configure_sqlite_engine(engine)
+    return engine
+
+def create_async_db_engine(url: str):
+    """Async engine for the request handlers."""
+    url = normalize_database_url(url)
+    engine = create_async_engine(get_async_database_url(url), **engine_options(url))
+    configure_sqlite_engine(engine.sync_engine)
+    return engine
+
 # Database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./kindergarten_meals.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_db_engine(settings.database_url)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+async_engine = create_async_db_engine(settings.database_url)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Read replica; without DATABASE_READ_URL reads share the primary engine
+if settings.database_read_url:
+    async_read_engine = create_async_db_engine(settings.database_read_url)
+else:
+    async_read_engine = async_engine
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Database Dependency
 def get_db():
     db = SessionLocal()
@@ -15,3 +125,12 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    """Session for read-only endpoints, bound to the replica when one is configured."""
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -1,14 +1,8 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from main import Base, Ingredient, Meal, MealIngredient, User, MealServing, IngredientDelivery
+from database import engine, SessionLocal
+from models.models import Base, Ingredient, Meal, MealIngredient, User, MealServing, IngredientDelivery
 from datetime import datetime, timedelta
 import random
 
-# Database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./kindergarten_meals.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
 # Create tables
 Base.metadata.create_all(bind=engine)
 
@@ -1,15 +1,9 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from database import engine, SessionLocal
 from models.models import Base, User, UserRole, Meal, MealServing, Ingredient, IngredientStatus
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 import random
 
-# Database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./kindergarten_meals.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -0,0 +1,153 @@
+"""Baseline schema
+
+Tables as created by ``Base.metadata.create_all`` before migrations were
+introduced. Tables that already exist are left alone, so databases built
+by ``init_db.py`` or the app's startup ``create_all`` can be upgraded in
+place.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2025-06-04 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001_baseline"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _timestamps():
+    return [
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    ]
+
+
+def _create_table(existing, name, *columns, indexes=()):
+    if name in existing:
+        return
+    op.create_table(name, *columns)
+    for index_name, index_columns, unique in indexes:
+        op.create_index(index_name, name, index_columns, unique=unique)
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    _create_table(
+        existing, "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String()),
+        sa.Column("name", sa.String()),
+        sa.Column("hashed_password", sa.String()),
+        sa.Column("role", sa.String()),
+        *_timestamps(),
+        indexes=[
+            ("ix_users_id", ["id"], False),
+            ("ix_users_email", ["email"], True),
+            ("ix_users_name", ["name"], False),
+        ],
+    )
+    _create_table(
+        existing, "ingredients",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("quantity", sa.Float()),
+        sa.Column("unit", sa.String()),
+        sa.Column("delivery_date", sa.DateTime()),
+        sa.Column("threshold", sa.Float()),
+        sa.Column("status", sa.String()),
+        *_timestamps(),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id")),
+        indexes=[
+            ("ix_ingredients_id", ["id"], False),
+            ("ix_ingredients_name", ["name"], True),
+        ],
+    )
+    _create_table(
+        existing, "ingredient_deliveries",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("ingredient_id", sa.Integer(), sa.ForeignKey("ingredients.id")),
+        sa.Column("quantity", sa.Float()),
+        sa.Column("delivery_date", sa.DateTime()),
+        *_timestamps(),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        indexes=[("ix_ingredient_deliveries_id", ["id"], False)],
+    )
+    _create_table(
+        existing, "meals",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("description", sa.String()),
+        sa.Column("image_url", sa.String(), nullable=True),
+        *_timestamps(),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id")),
+        indexes=[
+            ("ix_meals_id", ["id"], False),
+            ("ix_meals_name", ["name"], True),
+        ],
+    )
+    _create_table(
+        existing, "meal_ingredients",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("meal_id", sa.Integer(), sa.ForeignKey("meals.id")),
+        sa.Column("ingredient_id", sa.Integer(), sa.ForeignKey("ingredients.id")),
+        sa.Column("quantity", sa.Float()),
+        *_timestamps(),
+        indexes=[("ix_meal_ingredients_id", ["id"], False)],
+    )
+    _create_table(
+        existing, "meal_servings",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("meal_id", sa.Integer(), sa.ForeignKey("meals.id")),
+        sa.Column("portions", sa.Integer()),
+        sa.Column("serving_date", sa.DateTime()),
+        *_timestamps(),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        indexes=[("ix_meal_servings_id", ["id"], False)],
+    )
+    _create_table(
+        existing, "orders",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("ingredient_id", sa.Integer(), sa.ForeignKey("ingredients.id")),
+        sa.Column("quantity", sa.Float()),
+        sa.Column("status", sa.String()),
+        *_timestamps(),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id")),
+        indexes=[("ix_orders_id", ["id"], False)],
+    )
+    _create_table(
+        existing, "notifications",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("message", sa.Text()),
+        sa.Column("notification_type", sa.String()),
+        sa.Column("is_read", sa.Boolean()),
+        *_timestamps(),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        indexes=[("ix_notifications_id", ["id"], False)],
+    )
+    _create_table(
+        existing, "reports",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String()),
+        sa.Column("content", sa.Text()),
+        sa.Column("report_type", sa.String()),
+        *_timestamps(),
+        indexes=[("ix_reports_id", ["id"], False)],
+    )
+
+
+def downgrade() -> None:
+    for name in [
+        "reports", "notifications", "orders", "meal_servings", "meal_ingredients",
+        "meals", "ingredient_deliveries", "ingredients", "users",
+    ]:
+        op.drop_table(name)
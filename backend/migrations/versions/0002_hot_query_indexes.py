@@ -0,0 +1,42 @@
+"""Composite indexes for the hot query shapes
+
+- meal_servings by serving_date range (monthly report), covering meal_id/portions
+- notifications by (user_id, is_read, created_at)
+- meal_ingredients by meal_id, covering ingredient_id/quantity
+- ingredient_deliveries by (ingredient_id, delivery_date)
+- orders by (status, created_at)
+
+Revision ID: 0002_hot_query_indexes
+Revises: 0001_baseline
+Create Date: 2025-06-05 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_hot_query_indexes"
+down_revision: Union[str, None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_meal_servings_date_meal_portions", "meal_servings", ["serving_date", "meal_id", "portions"]),
+    ("ix_notifications_user_read_created", "notifications", ["user_id", "is_read", "created_at"]),
+    ("ix_meal_ingredients_meal_ingredient_qty", "meal_ingredients", ["meal_id", "ingredient_id", "quantity"]),
+    ("ix_ingredient_deliveries_ingredient_date", "ingredient_deliveries", ["ingredient_id", "delivery_date"]),
+    ("ix_orders_status_created_at", "orders", ["status", "created_at"]),
+]
+
+
+def upgrade() -> None:
+    # create_all on a fresh database already builds these from the models
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,42 @@
+"""(created_at, id) indexes for keyset pagination
+
+The list endpoints page with a ``(created_at, id) > cursor`` seek instead of
+OFFSET; these indexes turn that seek into a range scan. Notifications also
+get ``(user_id, created_at, id)`` for the per-user list.
+
+Revision ID: 0003_keyset_pagination_indexes
+Revises: 0002_hot_query_indexes
+Create Date: 2025-06-09 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_keyset_pagination_indexes"
+down_revision: Union[str, None] = "0002_hot_query_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_ingredients_created_at_id", "ingredients", ["created_at", "id"]),
+    ("ix_ingredient_deliveries_created_at_id", "ingredient_deliveries", ["created_at", "id"]),
+    ("ix_meal_servings_created_at_id", "meal_servings", ["created_at", "id"]),
+    ("ix_orders_created_at_id", "orders", ["created_at", "id"]),
+    ("ix_notifications_user_created_id", "notifications", ["user_id", "created_at", "id"]),
+    ("ix_notifications_created_at_id", "notifications", ["created_at", "id"]),
+    ("ix_reports_created_at_id", "reports", ["created_at", "id"]),
+]
+
+
+def upgrade() -> None:
+    # create_all on a fresh database already builds these from the models
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,57 @@
+"""Refresh tokens and revoked sessions
+
+``refresh_tokens`` holds a SHA-256 digest of every refresh token issued by
+``/token`` and ``/token/refresh``; ``revoked_sessions`` lists logins that
+were logged out or caught replaying a spent token.
+
+Revision ID: 0004_refresh_tokens
+Revises: 0003_keyset_pagination_indexes
+Create Date: 2025-06-12 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_refresh_tokens"
+down_revision: Union[str, None] = "0003_keyset_pagination_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app's startup create_all may already have built these tables
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "refresh_tokens" not in existing:
+        op.create_table(
+            "refresh_tokens",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("token_hash", sa.String(length=64), nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("session_id", sa.String(length=32), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.Column("used_at", sa.DateTime(), nullable=True),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_refresh_tokens_id", "refresh_tokens", ["id"])
+        op.create_index("ix_refresh_tokens_token_hash", "refresh_tokens", ["token_hash"], unique=True)
+        op.create_index("ix_refresh_tokens_session_id", "refresh_tokens", ["session_id"])
+        op.create_index("ix_refresh_tokens_user_expires", "refresh_tokens", ["user_id", "expires_at"])
+
+    if "revoked_sessions" not in existing:
+        op.create_table(
+            "revoked_sessions",
+            sa.Column("session_id", sa.String(length=32), primary_key=True),
+            sa.Column("revoked_at", sa.DateTime()),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_revoked_sessions_revoked_at", "revoked_sessions", ["revoked_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("revoked_sessions")
+    op.drop_table("refresh_tokens")
@@ -0,0 +1,48 @@
+"""Structured stock alerts on notifications
+
+Notifications get ``ingredient_id`` and ``alert_kind`` so the low-stock job
+can find existing alerts by key instead of matching ingredient names in the
+message text, plus a partial index over unread alerts only.
+
+Revision ID: 0005_notification_stock_alerts
+Revises: 0004_refresh_tokens
+Create Date: 2025-06-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_notification_stock_alerts"
+down_revision: Union[str, None] = "0004_refresh_tokens"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A database created by the app's startup create_all already has these columns
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("notifications")}
+    if "ingredient_id" not in columns:
+        # Batch mode, since SQLite cannot add a foreign key in place
+        with op.batch_alter_table("notifications") as batch:
+            batch.add_column(sa.Column("ingredient_id", sa.Integer(), sa.ForeignKey("ingredients.id", name="fk_notifications_ingredient_id"), nullable=True))
+            batch.add_column(sa.Column("alert_kind", sa.String(), nullable=True))
+
+    op.create_index(
+        "ix_notifications_unread_alerts",
+        "notifications",
+        ["user_id", "ingredient_id", "alert_kind"],
+        sqlite_where=sa.text("is_read = 0 AND ingredient_id IS NOT NULL"),
+        postgresql_where=sa.text("is_read = false AND ingredient_id IS NOT NULL"),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notifications_unread_alerts", table_name="notifications", if_exists=True)
+    with op.batch_alter_table("notifications") as batch:
+        batch.drop_column("alert_kind")
+        batch.drop_column("ingredient_id")
@@ -0,0 +1,53 @@
+"""Per-user read state for broadcast notifications
+
+A broadcast notification (``user_id`` NULL) is stored once. Each user's
+read state for broadcasts is a watermark in ``notification_watermarks``
+plus the broadcasts above it they read one by one in ``notification_reads``;
+``(user_id, id)`` on notifications turns "broadcasts above my watermark"
+into a range scan.
+
+Revision ID: 0006_notification_read_state
+Revises: 0005_notification_stock_alerts
+Create Date: 2025-06-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_notification_read_state"
+down_revision: Union[str, None] = "0005_notification_stock_alerts"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app's startup create_all may already have built these tables
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "notification_watermarks" not in existing:
+        op.create_table(
+            "notification_watermarks",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("last_read_id", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime()),
+        )
+
+    if "notification_reads" not in existing:
+        op.create_table(
+            "notification_reads",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("notification_id", sa.Integer(), sa.ForeignKey("notifications.id"), primary_key=True),
+            sa.Column("created_at", sa.DateTime()),
+        )
+
+    op.create_index("ix_notifications_user_id_id", "notifications", ["user_id", "id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notifications_user_id_id", table_name="notifications", if_exists=True)
+    op.drop_table("notification_reads")
+    op.drop_table("notification_watermarks")
@@ -0,0 +1,48 @@
+"""Unread notification counters
+
+``notification_counters`` keeps each user's unread count in parts and
+``counters`` the number of broadcasts, so the unread count is read instead
+of counted. Rows are built from the notifications the first time a count
+is asked for, so nothing is backfilled here.
+
+Revision ID: 0007_notification_counters
+Revises: 0006_notification_read_state
+Create Date: 2025-06-20 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_notification_counters"
+down_revision: Union[str, None] = "0006_notification_read_state"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app's startup create_all may already have built these tables
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "counters" not in existing:
+        op.create_table(
+            "counters",
+            sa.Column("name", sa.String(length=64), primary_key=True),
+            sa.Column("value", sa.Integer(), nullable=False),
+        )
+
+    if "notification_counters" not in existing:
+        op.create_table(
+            "notification_counters",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("unread", sa.Integer(), nullable=False),
+            sa.Column("broadcasts_read", sa.Integer(), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("notification_counters")
+    op.drop_table("counters")
@@ -0,0 +1,51 @@
+"""Archive table for the notification retention job
+
+Read notifications past the retention period are moved out of
+``notifications`` into ``notification_archives``, one gzip-compressed
+chunk of JSON lines per batch.
+
+Revision ID: 0008_notification_archives
+Revises: 0007_notification_counters
+Create Date: 2025-06-21 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_notification_archives"
+down_revision: Union[str, None] = "0007_notification_counters"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The app's startup create_all may already have built this table
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "notification_archives" not in existing:
+        op.create_table(
+            "notification_archives",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("first_notification_id", sa.Integer(), nullable=False),
+            sa.Column("last_notification_id", sa.Integer(), nullable=False),
+            sa.Column("row_count", sa.Integer(), nullable=False),
+            sa.Column("raw_bytes", sa.Integer(), nullable=False),
+            sa.Column("data", sa.LargeBinary(), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+        )
+
+    op.create_index(
+        "ix_notification_archives_first_notification_id",
+        "notification_archives",
+        ["first_notification_id"],
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notification_archives_first_notification_id", table_name="notification_archives", if_exists=True)
+    op.drop_table("notification_archives")
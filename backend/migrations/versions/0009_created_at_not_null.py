@@ -0,0 +1,42 @@
+"""created_at NOT NULL on the keyset-paged tables
+
+The list endpoints seek on ``(created_at, id) > cursor``, a comparison a
+NULL ``created_at`` never satisfies, so such rows were skipped or repeated
+across pages. Existing NULLs take ``updated_at`` (or the epoch when that is
+NULL too) and the column becomes NOT NULL.
+
+Revision ID: 0009_created_at_not_null
+Revises: 0008_notification_archives
+Create Date: 2025-06-22 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009_created_at_not_null"
+down_revision: Union[str, None] = "0008_notification_archives"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ["ingredients", "ingredient_deliveries", "meal_servings", "orders", "notifications", "reports"]
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.execute(
+            f"UPDATE {table} SET created_at = COALESCE(updated_at, '1970-01-01 00:00:00') "
+            "WHERE created_at IS NULL"
+        )
+        # Batch mode, since SQLite cannot change a column's nullability in place
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column("created_at", existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column("created_at", existing_type=sa.DateTime(), nullable=True)
@@ -0,0 +1,39 @@
+"""ingredients.status_changed_at for the low-stock alert job
+
+The job skipped an ingredient that had an alert created since its
+``updated_at``, but every serving moves ``updated_at``, so an ingredient
+served after its alert was alerted again each run. It now compares against
+the time the status last changed; existing rows take ``updated_at``.
+
+Revision ID: 0010_ingredient_status_changed_at
+Revises: 0009_created_at_not_null
+Create Date: 2025-06-23 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010_ingredient_status_changed_at"
+down_revision: Union[str, None] = "0009_created_at_not_null"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("ingredients")}
+    if "status_changed_at" not in columns:
+        op.add_column("ingredients", sa.Column("status_changed_at", sa.DateTime(), nullable=True))
+    op.execute(
+        "UPDATE ingredients SET status_changed_at = COALESCE(updated_at, created_at) "
+        "WHERE status_changed_at IS NULL"
+    )
+
+
+def downgrade() -> None:
+    # Batch mode, since older SQLite cannot drop a column in place
+    with op.batch_alter_table("ingredients") as batch:
+        batch.drop_column("status_changed_at")
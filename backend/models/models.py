@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Text, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -32,6 +32,10 @@ class NotificationType(str, PyEnum):
     INVENTORY_DELIVERY = "inventory_delivery"
     INVENTORY_UPDATE = "inventory_update"
 
+class AlertKind(str, PyEnum):
+    LOW_STOCK = "low_stock"
+    OUT_OF_STOCK = "out_of_stock"
+
 # Database Models
 class User(Base):
     __tablename__ = "users"
@@ -48,10 +52,14 @@ class User(Base):
     servings = relationship("MealServing", back_populates="user")
     deliveries = relationship("IngredientDelivery", back_populates="user")
     orders = relationship("Order", back_populates="created_by_user")
-    notifications = relationship("Notification", back_populates="user")
+    notifications = relationship("Notification", back_populates="user", foreign_keys="Notification.user_id")
 
 class Ingredient(Base):
     __tablename__ = "ingredients"
+    __table_args__ = (
+        # Keyset pagination order for the list endpoints
+        Index("ix_ingredients_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
@@ -60,7 +68,10 @@ class Ingredient(Base):
     delivery_date = Column(DateTime, default=datetime.utcnow)
     threshold = Column(Float)
     status = Column(String, default=IngredientStatus.AVAILABLE)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # When status last changed; the low-stock job alerts once per change.
+    # updated_at moves on every serving, so it cannot tell a new crossing
+    status_changed_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     created_by = Column(Integer, ForeignKey("users.id"))
     
@@ -71,12 +82,16 @@ class Ingredient(Base):
 
 class IngredientDelivery(Base):
     __tablename__ = "ingredient_deliveries"
+    __table_args__ = (
+        Index("ix_ingredient_deliveries_ingredient_date", "ingredient_id", "delivery_date"),
+        Index("ix_ingredient_deliveries_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     ingredient_id = Column(Integer, ForeignKey("ingredients.id"))
     quantity = Column(Float)
     delivery_date = Column(DateTime, default=datetime.utcnow)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = Column(Integer, ForeignKey("users.id"))
     
@@ -101,6 +116,10 @@ class Meal(Base):
 
 class MealIngredient(Base):
     __tablename__ = "meal_ingredients"
+    __table_args__ = (
+        # Covers recipe lookups (meal_requirements, catalog joins) without touching the table
+        Index("ix_meal_ingredients_meal_ingredient_qty", "meal_id", "ingredient_id", "quantity"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     meal_id = Column(Integer, ForeignKey("meals.id"))
@@ -115,12 +134,17 @@ class MealIngredient(Base):
 
 class MealServing(Base):
     __tablename__ = "meal_servings"
+    __table_args__ = (
+        # Covers the monthly report: range on serving_date, sums portions per meal
+        Index("ix_meal_servings_date_meal_portions", "serving_date", "meal_id", "portions"),
+        Index("ix_meal_servings_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     meal_id = Column(Integer, ForeignKey("meals.id"))
     portions = Column(Integer)
     serving_date = Column(DateTime, default=datetime.utcnow)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = Column(Integer, ForeignKey("users.id"))
     
@@ -130,12 +154,16 @@ class MealServing(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_status_created_at", "status", "created_at"),
+        Index("ix_orders_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     ingredient_id = Column(Integer, ForeignKey("ingredients.id"))
     quantity = Column(Float)
     status = Column(String, default=OrderStatus.PENDING)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     created_by = Column(Integer, ForeignKey("users.id"))
     
@@ -145,26 +173,132 @@ class Order(Base):
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_read_created", "user_id", "is_read", "created_at"),
+        Index("ix_notifications_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_notifications_created_at_id", "created_at", "id"),
+        # Broadcasts (user_id NULL) after a user's read watermark
+        Index("ix_notifications_user_id_id", "user_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    # NULL for a broadcast, stored once for everyone
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     message = Column(Text)
     notification_type = Column(String, default=NotificationType.SYSTEM)
+    # Only meaningful for a user's own notifications; who has read a
+    # broadcast is kept in NotificationWatermark and NotificationRead
     is_read = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # Set on stock alerts: the ingredient concerned and an AlertKind
+    ingredient_id = Column(Integer, ForeignKey("ingredients.id"), nullable=True)
+    alert_kind = Column(String, nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="notifications", foreign_keys=[user_id])
     creator = relationship("User", foreign_keys=[created_by])
 
+# Stock alerts not flagged read (broadcast alerts never are), so the low-stock
+# job's "already alerted?" check stays a small index probe however much
+# notification history piles up
+_unread_alerts = (Notification.is_read == False) & Notification.ingredient_id.isnot(None)
+Index(
+    "ix_notifications_unread_alerts",
+    Notification.user_id, Notification.ingredient_id, Notification.alert_kind,
+    sqlite_where=_unread_alerts,
+    postgresql_where=_unread_alerts,
+)
+
+class NotificationWatermark(Base):
+    """Every broadcast notification with an id up to ``last_read_id`` is read by the user."""
+    __tablename__ = "notification_watermarks"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    last_read_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class NotificationRead(Base):
+    """A broadcast notification above the user's watermark that they have read."""
+    __tablename__ = "notification_reads"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    notification_id = Column(Integer, ForeignKey("notifications.id"), primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Counter.name of the number of broadcast notifications
+BROADCAST_TOTAL = "broadcast_notifications"
+
+class Counter(Base):
+    """A running total kept up to date by the statements that change it."""
+    __tablename__ = "counters"
+
+    name = Column(String(64), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+class NotificationCounter(Base):
+    """
+    A user's unread count in parts: ``unread`` of their own notifications,
+    plus every broadcast (the BROADCAST_TOTAL counter) minus the
+    ``broadcasts_read`` of them. Updated with each insert, read and delete.
+    """
+    __tablename__ = "notification_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    unread = Column(Integer, nullable=False, default=0)
+    broadcasts_read = Column(Integer, nullable=False, default=0)
+
+class NotificationArchive(Base):
+    """
+    Read notifications moved out of ``notifications`` by the retention job:
+    one batch of rows (ids first_notification_id..last_notification_id) as
+    gzip-compressed JSON lines.
+    """
+    __tablename__ = "notification_archives"
+
+    id = Column(Integer, primary_key=True)
+    first_notification_id = Column(Integer, nullable=False, index=True)
+    last_notification_id = Column(Integer, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    # Size of the JSON lines before compression
+    raw_bytes = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (
+        Index("ix_reports_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String)
     content = Column(Text)
     report_type = Column(String)  # monthly, inventory, efficiency
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        Index("ix_refresh_tokens_user_expires", "user_id", "expires_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    # SHA-256 of the token; the token itself is only ever held by the client
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Every token rotated from the same login shares a session id
+    session_id = Column(String(32), index=True, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class RevokedSession(Base):
+    __tablename__ = "revoked_sessions"
+
+    session_id = Column(String(32), primary_key=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # After this no token of the session can be valid and the row can be dropped
+    expires_at = Column(DateTime, nullable=False)
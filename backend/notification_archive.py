@@ -0,0 +1,221 @@
+"""
+Notification retention: moves read notifications older than
+NOTIFICATION_RETENTION_DAYS out of ``notifications`` into compressed
+``notification_archives`` chunks. Run nightly by Celery beat, or by hand:
+
+    python notification_archive.py
+"""
+import gzip
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pydantic import BaseSettings
+from sqlalchemy import and_, delete, exists, func, or_, select, text, update
+
+from database import SessionLocal
+from models.models import (
+    BROADCAST_TOTAL, Counter, Ingredient, IngredientStatus, Notification, NotificationArchive, NotificationCounter,
+    NotificationRead, NotificationWatermark, User
+)
+
+
+class NotificationRetentionSettings(BaseSettings):
+    """Notification retention job, read from environment variables of the same name."""
+    # Read notifications older than this are archived; 0 turns the job off
+    notification_retention_days: int = 90
+    # Rows moved per transaction, and the pause between transactions that
+    # lets the API's writes in; each batch holds the write lock only briefly
+    notification_archive_batch_size: int = 1000
+    notification_archive_pause_ms: int = 50
+
+
+settings = NotificationRetentionSettings()
+
+_COLUMNS = [column.name for column in Notification.__table__.columns]
+
+
+def read_by(user_id):
+    """Whether the user ``user_id`` (a column of the outer statement) has read a broadcast."""
+    watermark = (
+        select(NotificationWatermark.last_read_id)
+        .where(NotificationWatermark.user_id == user_id)
+        .correlate_except(NotificationWatermark)
+        .scalar_subquery()
+    )
+    return or_(
+        Notification.id <= func.coalesce(watermark, 0),
+        exists()
+        .where(NotificationRead.user_id == user_id, NotificationRead.notification_id == Notification.id)
+        .correlate_except(NotificationRead),
+    )
+
+
+def read_by_everyone():
+    """
+    Whether a broadcast has been read by every user who existed when it
+    was sent. Users who joined later never saw it and do not hold it back.
+    """
+    return ~exists().where(
+        or_(User.created_at.is_(None), User.created_at <= Notification.created_at),
+        ~read_by(User.id),
+    )
+
+
+def alerting():
+    """
+    Whether a notification is a stock alert for an ingredient that is still
+    low or out of stock: the low-stock job checks for it, and would send
+    the alert again if it were archived.
+    """
+    return and_(
+        Notification.alert_kind.isnot(None),
+        exists().where(
+            Ingredient.id == Notification.ingredient_id,
+            Ingredient.status.in_([IngredientStatus.LOW.value, IngredientStatus.OUT_OF_STOCK.value]),
+        )
+    )
+
+
+def archivable(cutoff: datetime):
+    """
+    Notifications older than ``cutoff`` that are read: by their user, or for
+    a broadcast by everyone. Alerts for ingredients still low are kept.
+    """
+    return and_(
+        Notification.created_at < cutoff,
+        or_(
+            and_(Notification.user_id.isnot(None), Notification.is_read == True),
+            and_(Notification.user_id.is_(None), read_by_everyone()),
+        ),
+        ~alerting(),
+    )
+
+
+def pack(rows) -> tuple:
+    """Rows as gzip-compressed JSON lines; returns (data, uncompressed size)."""
+    lines = "".join(
+        json.dumps({name: getattr(row, name) for name in _COLUMNS}, default=str) + "\n" for row in rows
+    ).encode()
+    return gzip.compress(lines), len(lines)
+
+
+def unpack(archive: NotificationArchive) -> list:
+    """The notification rows stored in an archive chunk, as dicts."""
+    return [json.loads(line) for line in gzip.decompress(archive.data).splitlines()]
+
+
+def database_space(db) -> dict:
+    """
+    Bytes used by the database and, for SQLite, how many of them are free
+    pages that new rows will reuse (VACUUM returns them to the OS).
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        page_size = db.execute(text("PRAGMA page_size")).scalar()
+        return {
+            "database_bytes": db.execute(text("PRAGMA page_count")).scalar() * page_size,
+            "free_bytes": db.execute(text("PRAGMA freelist_count")).scalar() * page_size,
+        }
+    return {
+        "database_bytes": db.execute(text("SELECT pg_database_size(current_database())")).scalar(),
+        "notifications_bytes": db.execute(text("SELECT pg_total_relation_size('notifications')")).scalar(),
+    }
+
+
+def archive_batch(db, cutoff: datetime, after_id: int, batch_size: int) -> Optional[dict]:
+    """
+    Move the next ``batch_size`` archivable notifications with ids above
+    ``after_id`` into one archive chunk and commit. Returns the chunk's
+    stats, or None when nothing is left.
+    """
+    rows = db.execute(
+        select(Notification)
+        .where(Notification.id > after_id, archivable(cutoff))
+        .order_by(Notification.id)
+        .limit(batch_size)
+    ).scalars().all()
+    if not rows:
+        return None
+
+    ids = [row.id for row in rows]
+    broadcasts = [row.id for row in rows if row.user_id is None]
+    data, raw_bytes = pack(rows)
+    db.add(NotificationArchive(
+        first_notification_id=ids[0],
+        last_notification_id=ids[-1],
+        row_count=len(rows),
+        raw_bytes=raw_bytes,
+        data=data,
+    ))
+    if broadcasts:
+        # Keep the unread counters in step: users who joined after a
+        # broadcast never read it, so each user loses only the ones they read
+        read_by_user = (
+            select(func.count())
+            .select_from(Notification)
+            .where(Notification.id.in_(broadcasts), read_by(NotificationCounter.user_id))
+            .scalar_subquery()
+        )
+        db.execute(
+            update(NotificationCounter)
+            .values(broadcasts_read=NotificationCounter.broadcasts_read - read_by_user)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            update(Counter).where(Counter.name == BROADCAST_TOTAL).values(value=Counter.value - len(broadcasts))
+        )
+    db.execute(delete(NotificationRead).where(NotificationRead.notification_id.in_(ids)))
+    db.execute(delete(Notification).where(Notification.id.in_(ids)).execution_options(synchronize_session=False))
+    db.commit()
+    db.expunge_all()
+
+    return {"last_id": ids[-1], "rows": len(rows), "raw_bytes": raw_bytes, "archived_bytes": len(data)}
+
+
+def archive_notifications(db, now: Optional[datetime] = None) -> dict:
+    """
+    Archive every read notification older than the retention period, one
+    short transaction per batch, and summarize what was moved and the
+    space before and after.
+    """
+    if settings.notification_retention_days <= 0:
+        return {"status": "disabled"}
+
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=settings.notification_retention_days)
+    space_before = database_space(db)
+    started = time.monotonic()
+
+    summary = {"cutoff": cutoff.isoformat(), "batches": 0, "rows": 0, "raw_bytes": 0, "archived_bytes": 0}
+    after_id = 0
+    while True:
+        batch = archive_batch(db, cutoff, after_id, settings.notification_archive_batch_size)
+        if batch is None:
+            break
+        after_id = batch.pop("last_id")
+        summary["batches"] += 1
+        for key, value in batch.items():
+            summary[key] += value
+        time.sleep(settings.notification_archive_pause_ms / 1000)
+
+    space_after = database_space(db)
+    if "free_bytes" in space_after:
+        reclaimed = space_after["free_bytes"] - space_before["free_bytes"]
+    else:
+        # Only counts once (auto)vacuum has processed the deleted rows
+        reclaimed = space_before["notifications_bytes"] - space_after["notifications_bytes"]
+
+    summary["seconds"] = round(time.monotonic() - started, 3)
+    summary["reclaimed_bytes"] = reclaimed
+    summary["space_before"] = space_before
+    summary["space_after"] = space_after
+    return summary
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        print(json.dumps(archive_notifications(db), indent=2))
+    finally:
+        db.close()
@@ -1,29 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from ..database import get_db
+from ..database import get_async_db
 from ..models.models import User
-from ..schemas.schemas import Token, UserResponse
-from ..utils.auth import authenticate_user, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from ..schemas.schemas import RefreshTokenRequest, Token
+from ..utils.auth import authenticate_user, create_access_token, token_claims, ACCESS_TOKEN_EXPIRE_MINUTES
+from ..utils.refresh_tokens import find_refresh_token, issue_refresh_token, new_session_id, revoke_session, rotate_refresh_token
 
 router = APIRouter(tags=["authentication"])
 
+def token_response(user: User, session_id: str, refresh_token: str) -> dict:
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data=token_claims(user, session_id), expires_delta=access_token_expires
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": user,
+        "refresh_token": refresh_token
+    }
+
 @router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email, "role": user.role}, expires_delta=access_token_expires
+    session_id = new_session_id()
+    refresh_token = issue_refresh_token(db, user.id, session_id)
+    await db.commit()
+    return token_response(user, session_id, refresh_token)
+
+@router.post("/token/refresh", response_model=Token)
+async def refresh_access_token(request: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Exchange a refresh token for a new access token and refresh token.
+
+    No password is checked, so this costs no bcrypt round. Each refresh
+    token works once; presenting a spent one revokes the whole login.
+    """
+    invalid_token_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
     )
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": user
-    }
+    rotated = await rotate_refresh_token(db, request.refresh_token)
+    if rotated is None:
+        # Keeps the revocation of a replayed token's login
+        await db.commit()
+        raise invalid_token_exception
+    spent, refresh_token = rotated
+
+    # Read the user afresh so a changed role or email lands in the new access token
+    user = await db.get(User, spent.user_id)
+    if user is None:
+        raise invalid_token_exception
+    await db.commit()
+    return token_response(user, spent.session_id, refresh_token)
+
+@router.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_refresh_token(request: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    """Log out: revoke the token's login, including access tokens already issued for it."""
+    db_token = await find_refresh_token(db, request.refresh_token)
+    if db_token is not None:
+        await revoke_session(db, db_token.session_id)
+        await db.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
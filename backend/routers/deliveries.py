@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
+import json
+from ..database import get_async_db, get_async_read_db
+from ..models.models import Ingredient, IngredientDelivery, User, UserRole
+from ..schemas.schemas import IngredientDeliveryCreate, IngredientDeliveryResponse
+from ..utils.auth import get_current_user
+from ..utils.pagination import finish_page, keyset_page
+from ..websocket import manager
+
+router = APIRouter(prefix="/ingredient-deliveries", tags=["deliveries"])
+
+@router.post("/", response_model=IngredientDeliveryResponse)
+async def create_ingredient_delivery(delivery: IngredientDeliveryCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(status_code=403, detail="Not authorized to create deliveries")
+    
+    db_ingredient = await db.scalar(select(Ingredient).where(Ingredient.id == delivery.ingredient_id))
+    if not db_ingredient:
+        raise HTTPException(status_code=404, detail="Ingredient not found")
+    
+    db_delivery = IngredientDelivery(
+        ingredient_id=delivery.ingredient_id,
+        quantity=delivery.quantity,
+        delivery_date=delivery.delivery_date or datetime.utcnow(),
+        user_id=current_user.id
+    )
+    db.add(db_delivery)
+    
+    # Update ingredient quantity; its status follows on flush
+    db_ingredient.quantity += delivery.quantity
+    
+    await db.commit()
+    await db.refresh(db_delivery)
+    
+    # Notify via WebSocket
+    await manager.broadcast(json.dumps({
+        "type": "delivery_created",
+        "data": {
+            "id": db_delivery.id,
+            "ingredient_id": db_delivery.ingredient_id,
+            "quantity": db_delivery.quantity,
+            "ingredient_name": db_ingredient.name,
+            "new_quantity": db_ingredient.quantity
+        }
+    }), topic="inventory")
+    
+    return db_delivery
+
+@router.get("/", response_model=List[IngredientDeliveryResponse])
+async def read_ingredient_deliveries(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user)):
+    deliveries = (await db.scalars(keyset_page(select(IngredientDelivery), IngredientDelivery, cursor, limit).offset(skip))).all()
+    return finish_page(response, deliveries, limit)
@@ -1,41 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, WebSocket
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import json
-from ..database import get_db
-from ..models.models import Ingredient, IngredientStatus, User, UserRole
+from ..database import get_async_db, get_async_read_db
+from ..models.models import Ingredient, User, UserRole
 from ..schemas.schemas import IngredientCreate, IngredientResponse, IngredientUpdate
 from ..utils.auth import get_current_user
+from ..utils.pagination import finish_page, keyset_page
 from ..websocket import manager
 
 router = APIRouter(prefix="/ingredients", tags=["ingredients"])
 
 @router.post("/", response_model=IngredientResponse)
-async def create_ingredient(ingredient: IngredientCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_ingredient(ingredient: IngredientCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         raise HTTPException(status_code=403, detail="Not authorized to create ingredients")
     
-    db_ingredient = db.query(Ingredient).filter(Ingredient.name == ingredient.name).first()
+    db_ingredient = await db.scalar(select(Ingredient).where(Ingredient.name == ingredient.name))
     if db_ingredient:
         raise HTTPException(status_code=400, detail="Ingredient already exists")
     
-    status = IngredientStatus.AVAILABLE
-    if ingredient.quantity <= 0:
-        status = IngredientStatus.OUT_OF_STOCK
-    elif ingredient.quantity <= ingredient.threshold:
-        status = IngredientStatus.LOW
-    
+    # Status and low-stock alerts follow the quantity (utils/stock_alerts.py)
     db_ingredient = Ingredient(
         name=ingredient.name,
         quantity=ingredient.quantity,
         unit=ingredient.unit,
         threshold=ingredient.threshold,
-        status=status,
         created_by=current_user.id
     )
     db.add(db_ingredient)
-    db.commit()
-    db.refresh(db_ingredient)
+    await db.commit()
+    await db.refresh(db_ingredient)
     
     # Notify via WebSocket
     await manager.broadcast(json.dumps({
@@ -50,28 +46,28 @@ async def create_ingredient(ingredient: IngredientCreate, db: Session = Depends(
             "createdBy": current_user.name
         },
         "timestamp": db_ingredient.created_at.isoformat()
-    }))
+    }), topic="inventory")
     
     return db_ingredient
 
 @router.get("/", response_model=List[IngredientResponse])
-async def read_ingredients(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    ingredients = db.query(Ingredient).offset(skip).limit(limit).all()
-    return ingredients
+async def read_ingredients(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user)):
+    ingredients = (await db.scalars(keyset_page(select(Ingredient), Ingredient, cursor, limit).offset(skip))).all()
+    return finish_page(response, ingredients, limit)
 
 @router.get("/{ingredient_id}", response_model=IngredientResponse)
-async def read_ingredient(ingredient_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    db_ingredient = db.query(Ingredient).filter(Ingredient.id == ingredient_id).first()
+async def read_ingredient(ingredient_id: int, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user)):
+    db_ingredient = await db.scalar(select(Ingredient).where(Ingredient.id == ingredient_id))
     if not db_ingredient:
         raise HTTPException(status_code=404, detail="Ingredient not found")
     return db_ingredient
 
 @router.put("/{ingredient_id}", response_model=IngredientResponse)
-async def update_ingredient(ingredient_id: int, ingredient: IngredientUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def update_ingredient(ingredient_id: int, ingredient: IngredientUpdate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         raise HTTPException(status_code=403, detail="Not authorized to update ingredients")
     
-    db_ingredient = db.query(Ingredient).filter(Ingredient.id == ingredient_id).first()
+    db_ingredient = await db.scalar(select(Ingredient).where(Ingredient.id == ingredient_id))
     if not db_ingredient:
         raise HTTPException(status_code=404, detail="Ingredient not found")
     
@@ -81,24 +77,17 @@ async def update_ingredient(ingredient_id: int, ingredient: IngredientUpdate, db
         db_ingredient.name = ingredient.name
     if ingredient.quantity is not None:
         db_ingredient.quantity = ingredient.quantity
-        
-        # Update status based on quantity
-        if db_ingredient.quantity <= 0:
-            db_ingredient.status = IngredientStatus.OUT_OF_STOCK
-        elif db_ingredient.quantity <= db_ingredient.threshold:
-            db_ingredient.status = IngredientStatus.LOW
-        else:
-            db_ingredient.status = IngredientStatus.AVAILABLE
     
     if ingredient.unit is not None:
         db_ingredient.unit = ingredient.unit
     if ingredient.threshold is not None:
         db_ingredient.threshold = ingredient.threshold
+    # Otherwise the status is recomputed from the new quantity and threshold
     if ingredient.status is not None:
         db_ingredient.status = ingredient.status
     
-    db.commit()
-    db.refresh(db_ingredient)
+    await db.commit()
+    await db.refresh(db_ingredient)
     
     # Notify via WebSocket
     await manager.broadcast(json.dumps({
@@ -114,23 +103,23 @@ async def update_ingredient(ingredient_id: int, ingredient: IngredientUpdate, db
             "updatedBy": current_user.name
         },
         "timestamp": db_ingredient.updated_at.isoformat()
-    }))
+    }), topic="inventory", key=f"ingredient:{db_ingredient.id}")
     
     return db_ingredient
 
 @router.delete("/{ingredient_id}", response_model=IngredientResponse)
-async def delete_ingredient(ingredient_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def delete_ingredient(ingredient_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         raise HTTPException(status_code=403, detail="Not authorized to delete ingredients")
     
-    db_ingredient = db.query(Ingredient).filter(Ingredient.id == ingredient_id).first()
+    db_ingredient = await db.scalar(select(Ingredient).where(Ingredient.id == ingredient_id))
     if not db_ingredient:
         raise HTTPException(status_code=404, detail="Ingredient not found")
     
     ingredient_name = db_ingredient.name
     
-    db.delete(db_ingredient)
-    db.commit()
+    await db.delete(db_ingredient)
+    await db.commit()
     
     # Notify via WebSocket
     await manager.broadcast(json.dumps({
@@ -142,6 +131,6 @@ async def delete_ingredient(ingredient_id: int, db: Session = Depends(get_db), c
             "deletedBy": current_user.name
         },
         "timestamp": db_ingredient.updated_at.isoformat()
-    }))
+    }), topic="inventory", key=f"ingredient:{ingredient_id}")
     
     return db_ingredient
@@ -0,0 +1,163 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
+import json
+from ..database import get_async_db, get_async_read_db
+from ..models.models import Meal, MealServing, User, UserRole
+from ..schemas.schemas import MealServingBatchCreate, MealServingCreate, MealServingResponse
+from ..utils.auth import get_current_user
+from ..utils.inventory import InsufficientStockError, deduct_stock, meal_requirements
+from ..utils.pagination import finish_page, keyset_page
+from ..websocket import manager
+
+router = APIRouter(prefix="/meal-servings", tags=["meal servings"])
+
+@router.post("/", response_model=MealServingResponse)
+async def create_meal_serving(serving: MealServingCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.COOK]:
+        raise HTTPException(status_code=403, detail="Not authorized to create meal servings")
+    
+    db_meal = await db.scalar(select(Meal).where(Meal.id == serving.meal_id))
+    if not db_meal:
+        raise HTTPException(status_code=404, detail="Meal not found")
+    
+    # Check and deduct all ingredients in one conditional UPDATE
+    try:
+        await deduct_stock(db, await meal_requirements(db, {serving.meal_id: serving.portions}))
+    except InsufficientStockError as e:
+        raise HTTPException(status_code=400, detail=e.detail)
+    
+    # Create meal serving
+    db_serving = MealServing(
+        meal_id=serving.meal_id,
+        portions=serving.portions,
+        serving_date=serving.serving_date or datetime.utcnow(),
+        user_id=current_user.id
+    )
+    db.add(db_serving)
+    await db.commit()
+    await db.refresh(db_serving)
+    
+    # Notify via WebSocket
+    await manager.broadcast(json.dumps({
+        "type": "meal_served",
+        "data": {
+            "id": db_serving.id,
+            "meal_id": db_serving.meal_id,
+            "meal_name": db_meal.name,
+            "portions": db_serving.portions,
+            "serving_date": db_serving.serving_date.isoformat()
+        }
+    }), topic="meals")
+    
+    response_serving = {
+        "id": db_serving.id,
+        "meal_id": db_serving.meal_id,
+        "portions": db_serving.portions,
+        "serving_date": db_serving.serving_date,
+        "created_at": db_serving.created_at,
+        "updated_at": db_serving.updated_at,
+        "user_id": db_serving.user_id,
+        "meal_name": db_meal.name
+    }
+    
+    return response_serving
+
+@router.post("/batch", response_model=List[MealServingResponse])
+async def create_meal_servings_batch(batch: MealServingBatchCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.COOK]:
+        raise HTTPException(status_code=403, detail="Not authorized to create meal servings")
+    
+    if not batch.servings:
+        return []
+    
+    meal_portions = {}
+    for serving in batch.servings:
+        meal_portions[serving.meal_id] = meal_portions.get(serving.meal_id, 0) + serving.portions
+    
+    meal_names = dict((await db.execute(select(Meal.id, Meal.name).where(Meal.id.in_(list(meal_portions))))).all())
+    for meal_id in meal_portions:
+        if meal_id not in meal_names:
+            raise HTTPException(status_code=404, detail=f"Meal with id {meal_id} not found")
+    
+    # Sum the whole run into one requirement vector and deduct it in one UPDATE
+    try:
+        await deduct_stock(db, await meal_requirements(db, meal_portions))
+    except InsufficientStockError as e:
+        raise HTTPException(status_code=400, detail=e.detail)
+    
+    # Create meal servings
+    now = datetime.utcnow()
+    db_servings = [
+        MealServing(
+            meal_id=serving.meal_id,
+            portions=serving.portions,
+            serving_date=serving.serving_date or now,
+            user_id=current_user.id
+        )
+        for serving in batch.servings
+    ]
+    db.add_all(db_servings)
+    await db.flush()
+    
+    # Build the response before commit expires the rows
+    response_servings = [
+        {
+            "id": db_serving.id,
+            "meal_id": db_serving.meal_id,
+            "portions": db_serving.portions,
+            "serving_date": db_serving.serving_date,
+            "created_at": db_serving.created_at,
+            "updated_at": db_serving.updated_at,
+            "user_id": db_serving.user_id,
+            "meal_name": meal_names[db_serving.meal_id]
+        }
+        for db_serving in db_servings
+    ]
+    await db.commit()
+    
+    # Notify via WebSocket once for the whole run
+    total_portions = sum(meal_portions.values())
+    await manager.broadcast(json.dumps({
+        "type": "meal_served_batch",
+        "message": f"{total_portions} portions served in {len(response_servings)} servings by {current_user.name}",
+        "data": {
+            "total_portions": total_portions,
+            "servings": [
+                {
+                    "id": response_serving["id"],
+                    "meal_id": response_serving["meal_id"],
+                    "meal_name": response_serving["meal_name"],
+                    "portions": response_serving["portions"],
+                    "serving_date": response_serving["serving_date"].isoformat()
+                }
+                for response_serving in response_servings
+            ]
+        }
+    }), topic="meals")
+    
+    return response_servings
+
+@router.get("/", response_model=List[MealServingResponse])
+async def read_meal_servings(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user)):
+    query = select(MealServing, Meal.name).join(Meal, Meal.id == MealServing.meal_id)
+    result = await db.execute(keyset_page(query, MealServing, cursor, limit).offset(skip))
+    rows = finish_page(response, result.all(), limit, key=lambda row: (row[0].created_at, row[0].id))
+    
+    response_servings = []
+    for serving, meal_name in rows:
+        response_serving = {
+            "id": serving.id,
+            "meal_id": serving.meal_id,
+            "portions": serving.portions,
+            "serving_date": serving.serving_date,
+            "created_at": serving.created_at,
+            "updated_at": serving.updated_at,
+            "user_id": serving.user_id,
+            "meal_name": meal_name
+        }
+        response_servings.append(response_serving)
+    
+    return response_servings
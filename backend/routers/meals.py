@@ -0,0 +1,163 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import json
+from ..database import get_async_db
+from ..models.models import Meal, MealIngredient, User, UserRole
+from ..schemas.schemas import MealCapacityResponse, MealCreate, MealResponse, MealUpdate
+from ..utils.auth import get_current_user
+from ..utils.capacity import serving_capacity
+from ..utils.meal_catalog import find_missing_ingredient, load_meal, meal_catalog
+from ..utils.pagination import decode_cursor, finish_page
+from ..websocket import manager
+
+router = APIRouter(prefix="/meals", tags=["meals"])
+
+@router.post("/", response_model=MealResponse)
+async def create_meal(meal: MealCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.COOK]:
+        raise HTTPException(status_code=403, detail="Not authorized to create meals")
+    
+    db_meal = await db.scalar(select(Meal).where(Meal.name == meal.name))
+    if db_meal:
+        raise HTTPException(status_code=400, detail="Meal already exists")
+    
+    missing_id = await find_missing_ingredient(db, meal.ingredients)
+    if missing_id is not None:
+        raise HTTPException(status_code=404, detail=f"Ingredient with id {missing_id} not found")
+    
+    db_meal = Meal(
+        name=meal.name,
+        description=meal.description,
+        image_url=meal.image_url,
+        created_by=current_user.id
+    )
+    db.add(db_meal)
+    await db.flush()
+    
+    # Add ingredients to meal
+    db.add_all([
+        MealIngredient(
+            meal_id=db_meal.id,
+            ingredient_id=ingredient_data.get("ingredient_id"),
+            quantity=ingredient_data.get("quantity")
+        )
+        for ingredient_data in meal.ingredients
+    ])
+    await db.commit()
+    
+    # Prepare response with ingredients
+    response_meal = await load_meal(db, db_meal.id)
+    
+    # Notify via WebSocket
+    await manager.broadcast(json.dumps({
+        "type": "meal_created",
+        "data": {
+            "id": response_meal["id"],
+            "name": response_meal["name"],
+            "description": response_meal["description"],
+            "image_url": response_meal["image_url"]
+        }
+    }), topic="meals")
+    
+    return response_meal
+
+@router.get("/", response_model=List[MealResponse])
+async def read_meals(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    after = decode_cursor(cursor) if cursor else None
+    meals = (await meal_catalog.get_page(db, after, skip + limit))[skip:]
+    return finish_page(response, meals, limit, key=lambda meal: (meal["created_at"], meal["id"]))
+
+@router.get("/capacity", response_model=List[MealCapacityResponse])
+async def read_meal_capacity(db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    # Served from memory; the database is only read when recipes changed
+    return await serving_capacity.get_all(db)
+
+@router.get("/{meal_id}", response_model=MealResponse)
+async def read_meal(meal_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    response_meal = await meal_catalog.get(db, meal_id)
+    if not response_meal:
+        raise HTTPException(status_code=404, detail="Meal not found")
+    return response_meal
+
+@router.put("/{meal_id}", response_model=MealResponse)
+async def update_meal(meal_id: int, meal: MealUpdate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.COOK]:
+        raise HTTPException(status_code=403, detail="Not authorized to update meals")
+    
+    db_meal = await db.scalar(select(Meal).where(Meal.id == meal_id))
+    if not db_meal:
+        raise HTTPException(status_code=404, detail="Meal not found")
+    
+    if meal.ingredients is not None:
+        missing_id = await find_missing_ingredient(db, meal.ingredients)
+        if missing_id is not None:
+            raise HTTPException(status_code=404, detail=f"Ingredient with id {missing_id} not found")
+    
+    if meal.name is not None:
+        db_meal.name = meal.name
+    if meal.description is not None:
+        db_meal.description = meal.description
+    if meal.image_url is not None:
+        db_meal.image_url = meal.image_url
+    
+    # Update ingredients if provided
+    if meal.ingredients is not None:
+        # Remove existing meal ingredients
+        await db.execute(delete(MealIngredient).where(MealIngredient.meal_id == meal_id))
+        
+        # Add new ingredients
+        db.add_all([
+            MealIngredient(
+                meal_id=db_meal.id,
+                ingredient_id=ingredient_data.get("ingredient_id"),
+                quantity=ingredient_data.get("quantity")
+            )
+            for ingredient_data in meal.ingredients
+        ])
+    
+    await db.commit()
+    
+    # Prepare response with ingredients
+    response_meal = await load_meal(db, meal_id)
+    
+    # Notify via WebSocket
+    await manager.broadcast(json.dumps({
+        "type": "meal_updated",
+        "data": {
+            "id": response_meal["id"],
+            "name": response_meal["name"],
+            "description": response_meal["description"],
+            "image_url": response_meal["image_url"]
+        }
+    }), topic="meals", key=f"meal:{meal_id}")
+    
+    return response_meal
+
+@router.delete("/{meal_id}", response_model=MealResponse)
+async def delete_meal(meal_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.COOK]:
+        raise HTTPException(status_code=403, detail="Not authorized to delete meals")
+    
+    # Prepare response with ingredients before deletion
+    response_meal = await load_meal(db, meal_id)
+    if not response_meal:
+        raise HTTPException(status_code=404, detail="Meal not found")
+    
+    # Delete meal ingredients first
+    await db.execute(delete(MealIngredient).where(MealIngredient.meal_id == meal_id))
+    
+    # Delete meal
+    await db.execute(delete(Meal).where(Meal.id == meal_id))
+    await db.commit()
+    
+    # Notify via WebSocket
+    await manager.broadcast(json.dumps({
+        "type": "meal_deleted",
+        "data": {
+            "id": meal_id
+        }
+    }), topic="meals", key=f"meal:{meal_id}")
+    
+    return response_meal
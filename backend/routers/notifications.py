@@ -1,29 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, WebSocket, WebSocketDisconnect
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 import json
 
-from ..database import get_db
+from ..database import get_async_db
 from ..models.models import Notification, User, UserRole
 from ..schemas.schemas import NotificationCreate, NotificationResponse, NotificationUpdate
 from ..utils.auth import get_current_user
-from ..websocket import manager
+from ..utils.notification_reads import (
+    add_unread, count_new_notifications, forget_broadcast_reads, is_read_expr, mark_all_read,
+    push_unread_counts, set_broadcast_read, unread_count, unread_filter
+)
+from ..utils.pagination import finish_page, keyset_page
+from ..websocket import manager, user_topic
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
+def notification_response(notification: Notification, is_read: bool) -> NotificationResponse:
+    """The notification with ``is_read`` as seen by the current user."""
+    response = NotificationResponse.from_orm(notification)
+    response.is_read = bool(is_read)
+    return response
+
+async def get_visible_notification(db: AsyncSession, notification_id: int, current_user: User):
+    """The notification and whether the user has read it; 404/403 unless they may see it."""
+    row = (await db.execute(
+        select(Notification, is_read_expr(current_user.id)).where(Notification.id == notification_id)
+    )).first()
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="Notification not found")
+    
+    db_notification, is_read = row
+    # Everyone sees broadcasts; admins and managers see every notification
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER] and db_notification.user_id not in (None, current_user.id):
+        raise HTTPException(status_code=403, detail="Not authorized to view this notification")
+    
+    return db_notification, is_read
+
 @router.post("/", response_model=NotificationResponse)
 async def create_notification(
     notification: NotificationCreate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(get_current_user)
 ):
     """
     Create a new notification.
     
-    If user_id is not provided, the notification will be sent to all users.
-    Admin and manager notifications are sent to all users with those roles.
+    If user_id is not provided, the notification is a broadcast: stored
+    once and shown to every user, each with their own read state.
     """
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Not authorized to create notifications")
+    
     # Create notification in database
     db_notification = Notification(
         user_id=notification.user_id,
@@ -32,10 +63,12 @@ async def create_notification(
         created_by=current_user.id
     )
     db.add(db_notification)
-    db.commit()
-    db.refresh(db_notification)
+    await count_new_notifications(db, [db_notification.user_id])
+    await db.commit()
+    await db.refresh(db_notification)
     
-    # Broadcast via WebSocket
+    # Broadcast via WebSocket; the row above is the stored copy
+    topic = user_topic(db_notification.user_id) if db_notification.user_id else "notifications"
     await manager.broadcast(json.dumps({
         "type": notification.notification_type,
         "message": notification.message,
@@ -51,127 +84,152 @@ async def create_notification(
             "role": current_user.role
         },
         "timestamp": db_notification.created_at.isoformat()
-    }))
+    }), topic=topic, save_to_db=False)
+    await push_unread_counts(db, [db_notification.user_id])
     
     return db_notification
 
 @router.get("/", response_model=List[NotificationResponse])
 async def read_notifications(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
+    cursor: Optional[str] = None,
     unread_only: bool = False,
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(get_current_user)
 ):
     """
     Get notifications for the current user.
     
     Admins and managers can see all notifications.
-    Other users can only see their own notifications.
+    Other users see their own notifications and broadcasts.
+    ``is_read`` is the current user's read state of each one.
+    Pass the X-Next-Cursor header of a page as ``cursor`` to get the next one.
     """
-    query = db.query(Notification)
+    everyone = current_user.role in [UserRole.ADMIN, UserRole.MANAGER]
+    query = select(Notification, is_read_expr(current_user.id))
     
     # Filter by user unless admin/manager
-    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
-        query = query.filter(Notification.user_id == current_user.id)
+    if not everyone:
+        query = query.where(or_(Notification.user_id == current_user.id, Notification.user_id.is_(None)))
     
     # Filter by read status if requested
     if unread_only:
-        query = query.filter(Notification.is_read == False)
+        query = query.where(unread_filter(current_user.id, everyone=everyone))
     
-    # Order by creation date (newest first)
-    query = query.order_by(Notification.created_at.desc())
+    # Order by creation date (newest first) and continue after the cursor
+    query = keyset_page(query, Notification, cursor, limit, descending=True)
     
     # Apply pagination
-    notifications = query.offset(skip).limit(limit).all()
+    rows = (await db.execute(query.offset(skip))).all()
+    rows = finish_page(response, rows, limit, key=lambda row: (row[0].created_at, row[0].id))
+    
+    return [notification_response(notification, is_read) for notification, is_read in rows]
+
+@router.put("/mark-all-read", response_model=dict)
+async def mark_all_notifications_read(
+    db: AsyncSession = Depends(get_async_db), 
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Mark all notifications as read for the current user.
+    
+    Broadcasts are marked read for this user only, by moving their read
+    watermark; other users' notifications are left alone.
+    """
+    count = await mark_all_read(db, current_user.id)
+    await db.commit()
+    if count:
+        await push_unread_counts(db, [current_user.id])
     
-    return notifications
+    return {"message": f"Marked {count} notifications as read"}
+
+@router.get("/unread-count", response_model=dict)
+async def read_unread_count(
+    db: AsyncSession = Depends(get_async_db), 
+    current_user: User = Depends(get_current_user)
+):
+    """
+    How many notifications the current user has not read: their own and
+    the broadcasts. Served from counters, so it costs the same however
+    many notifications there are; changes are also pushed over the
+    WebSocket as ``unread_count`` events.
+    """
+    return {"unread": await unread_count(db, current_user.id)}
 
 @router.get("/{notification_id}", response_model=NotificationResponse)
 async def read_notification(
     notification_id: int, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(get_current_user)
 ):
     """Get a specific notification by ID."""
-    db_notification = db.query(Notification).filter(Notification.id == notification_id).first()
-    
-    if not db_notification:
-        raise HTTPException(status_code=404, detail="Notification not found")
-    
-    # Check if user has permission to view this notification
-    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER] and db_notification.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to view this notification")
-    
-    return db_notification
+    db_notification, is_read = await get_visible_notification(db, notification_id, current_user)
+    return notification_response(db_notification, is_read)
 
 @router.put("/{notification_id}", response_model=NotificationResponse)
 async def update_notification(
     notification_id: int, 
     notification: NotificationUpdate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(get_current_user)
 ):
-    """Update a notification (mark as read/unread)."""
-    db_notification = db.query(Notification).filter(Notification.id == notification_id).first()
-    
-    if not db_notification:
-        raise HTTPException(status_code=404, detail="Notification not found")
-    
-    # Check if user has permission to update this notification
-    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER] and db_notification.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this notification")
-    
-    # Update notification
-    if notification.is_read is not None:
-        db_notification.is_read = notification.is_read
-    
-    db_notification.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_notification)
+    """
+    Update a notification (mark as read/unread).
     
-    return db_notification
+    For a broadcast this only changes the current user's read state.
+    """
+    db_notification, is_read = await get_visible_notification(db, notification_id, current_user)
+    
+    if notification.is_read is None:
+        return notification_response(db_notification, is_read)
+    
+    if db_notification.user_id is None:
+        owner_id = current_user.id
+        changed = bool(is_read) != notification.is_read
+        await set_broadcast_read(db, owner_id, db_notification.id, notification.is_read)
+    else:
+        owner_id = db_notification.user_id
+        # Conditional so that of two concurrent requests only one counts the change
+        result = await db.execute(
+            update(Notification)
+            .where(Notification.id == db_notification.id, Notification.is_read != notification.is_read)
+            .values(is_read=notification.is_read, updated_at=datetime.utcnow())
+        )
+        changed = bool(result.rowcount)
+        if changed:
+            await add_unread(db, owner_id, -1 if notification.is_read else 1)
+    await db.commit()
+    if changed:
+        await push_unread_counts(db, [owner_id])
+    
+    return notification_response(db_notification, notification.is_read)
 
 @router.delete("/{notification_id}", response_model=NotificationResponse)
 async def delete_notification(
     notification_id: int, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(get_current_user)
 ):
-    """Delete a notification."""
-    db_notification = db.query(Notification).filter(Notification.id == notification_id).first()
-    
-    if not db_notification:
-        raise HTTPException(status_code=404, detail="Notification not found")
+    """Delete a notification. A broadcast is deleted for everyone, so only admins and managers may."""
+    db_notification, is_read = await get_visible_notification(db, notification_id, current_user)
     
     # Check if user has permission to delete this notification
     if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER] and db_notification.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this notification")
     
     # Store notification data for return
-    notification_data = NotificationResponse.from_orm(db_notification)
+    notification_data = notification_response(db_notification, is_read)
     
     # Delete notification
-    db.delete(db_notification)
-    db.commit()
+    if db_notification.user_id is None:
+        await forget_broadcast_reads(db, [db_notification.id])
+    elif not db_notification.is_read:
+        await add_unread(db, db_notification.user_id, -1)
+    await db.delete(db_notification)
+    await db.commit()
+    if db_notification.user_id is None or not db_notification.is_read:
+        await push_unread_counts(db, [db_notification.user_id])
     
     return notification_data
-
-@router.put("/mark-all-read", response_model=dict)
-async def mark_all_notifications_read(
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
-):
-    """Mark all notifications as read for the current user."""
-    query = db.query(Notification).filter(Notification.is_read == False)
-    
-    # Filter by user unless admin/manager
-    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
-        query = query.filter(Notification.user_id == current_user.id)
-    
-    # Update all matching notifications
-    count = query.count()
-    query.update({"is_read": True, "updated_at": datetime.utcnow()})
-    db.commit()
-    
-    return {"message": f"Marked {count} notifications as read"}
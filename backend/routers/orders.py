@@ -0,0 +1,125 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import json
+from ..database import get_async_db, get_async_read_db
+from ..models.models import Ingredient, Order, OrderStatus, User, UserRole
+from ..schemas.schemas import OrderCreate, OrderResponse, OrderUpdate
+from ..utils.auth import get_current_user
+from ..utils.pagination import finish_page, keyset_page
+from ..websocket import manager
+
+router = APIRouter(prefix="/orders", tags=["orders"])
+
+@router.post("/", response_model=OrderResponse)
+async def create_order(order: OrderCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(status_code=403, detail="Not authorized to create orders")
+    
+    db_ingredient = await db.scalar(select(Ingredient).where(Ingredient.id == order.ingredient_id))
+    if not db_ingredient:
+        raise HTTPException(status_code=404, detail="Ingredient not found")
+    
+    db_order = Order(
+        ingredient_id=order.ingredient_id,
+        quantity=order.quantity,
+        status=OrderStatus.PENDING,
+        created_by=current_user.id
+    )
+    db.add(db_order)
+    await db.commit()
+    await db.refresh(db_order)
+    
+    # Notify via WebSocket
+    await manager.broadcast(json.dumps({
+        "type": "order_created",
+        "data": {
+            "id": db_order.id,
+            "ingredient_id": db_order.ingredient_id,
+            "ingredient_name": db_ingredient.name,
+            "quantity": db_order.quantity,
+            "status": db_order.status
+        }
+    }), topic="orders")
+    
+    response_order = {
+        "id": db_order.id,
+        "ingredient_id": db_order.ingredient_id,
+        "quantity": db_order.quantity,
+        "status": db_order.status,
+        "created_at": db_order.created_at,
+        "updated_at": db_order.updated_at,
+        "created_by": db_order.created_by,
+        "ingredient_name": db_ingredient.name
+    }
+    
+    return response_order
+
+@router.get("/", response_model=List[OrderResponse])
+async def read_orders(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user)):
+    query = select(Order, Ingredient.name).join(Ingredient, Ingredient.id == Order.ingredient_id)
+    result = await db.execute(keyset_page(query, Order, cursor, limit).offset(skip))
+    rows = finish_page(response, result.all(), limit, key=lambda row: (row[0].created_at, row[0].id))
+    
+    response_orders = []
+    for order, ingredient_name in rows:
+        response_order = {
+            "id": order.id,
+            "ingredient_id": order.ingredient_id,
+            "quantity": order.quantity,
+            "status": order.status,
+            "created_at": order.created_at,
+            "updated_at": order.updated_at,
+            "created_by": order.created_by,
+            "ingredient_name": ingredient_name
+        }
+        response_orders.append(response_order)
+    
+    return response_orders
+
+@router.put("/{order_id}", response_model=OrderResponse)
+async def update_order(order_id: int, order: OrderUpdate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(status_code=403, detail="Not authorized to update orders")
+    
+    db_order = await db.scalar(select(Order).where(Order.id == order_id))
+    if not db_order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    db_ingredient = await db.scalar(select(Ingredient).where(Ingredient.id == db_order.ingredient_id))
+    
+    # Update order status
+    db_order.status = order.status
+    
+    # If order is delivered, update ingredient quantity; its status follows on flush
+    if order.status == OrderStatus.DELIVERED:
+        db_ingredient.quantity += db_order.quantity
+    
+    await db.commit()
+    await db.refresh(db_order)
+    
+    # Notify via WebSocket
+    await manager.broadcast(json.dumps({
+        "type": "order_updated",
+        "data": {
+            "id": db_order.id,
+            "ingredient_id": db_order.ingredient_id,
+            "ingredient_name": db_ingredient.name,
+            "quantity": db_order.quantity,
+            "status": db_order.status
+        }
+    }), topic="orders", key=f"order:{db_order.id}")
+    
+    response_order = {
+        "id": db_order.id,
+        "ingredient_id": db_order.ingredient_id,
+        "quantity": db_order.quantity,
+        "status": db_order.status,
+        "created_at": db_order.created_at,
+        "updated_at": db_order.updated_at,
+        "created_by": db_order.created_by,
+        "ingredient_name": db_ingredient.name
+    }
+    
+    return response_order
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from ..database import get_async_db, get_async_read_db
+from ..models.models import Report, User, UserRole
+from ..schemas.schemas import ReportCreate, ReportResponse
+from ..utils.auth import get_current_user
+from ..utils.pagination import finish_page, keyset_page
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+@router.post("/", response_model=ReportResponse)
+async def create_report(report: ReportCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(status_code=403, detail="Not authorized to create reports")
+    
+    db_report = Report(
+        title=report.title,
+        content=report.content,
+        report_type=report.report_type
+    )
+    db.add(db_report)
+    await db.commit()
+    await db.refresh(db_report)
+    return db_report
+
+@router.get("/", response_model=List[ReportResponse])
+async def read_reports(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user)):
+    if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
+        raise HTTPException(status_code=403, detail="Not authorized to view reports")
+    
+    reports = (await db.scalars(keyset_page(select(Report), Report, cursor, limit).offset(skip))).all()
+    return finish_page(response, reports, limit)
@@ -1,23 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from ..database import get_db
+from ..database import get_async_db
 from ..models.models import User, UserRole
 from ..schemas.schemas import UserCreate, UserResponse, UserUpdate
-from ..utils.auth import get_current_user, get_password_hash, get_user
+from ..utils.auth import get_current_user, get_password_hash, get_user, invalidate_principal
+from ..utils.notification_reads import forget_user_reads
+from ..utils.refresh_tokens import delete_refresh_tokens, revoke_user_sessions
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.post("/", response_model=UserResponse)
-async def create_user(user: UserCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized to create users")
     
-    db_user = get_user(db, email=user.email)
+    db_user = await get_user(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     db_user = User(
         email=user.email,
         name=user.name,
@@ -25,16 +28,16 @@ async def create_user(user: UserCreate, db: Session = Depends(get_db), current_u
         role=user.role
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.get("/", response_model=List[UserResponse])
-async def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def read_users(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized to view all users")
     
-    users = db.query(User).offset(skip).limit(limit).all()
+    users = (await db.scalars(select(User).offset(skip).limit(limit))).all()
     return users
 
 @router.get("/me/", response_model=UserResponse)
@@ -42,11 +45,11 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.put("/{user_id}", response_model=UserResponse)
-async def update_user(user_id: int, user: UserUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def update_user(user_id: int, user: UserUpdate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     if current_user.role != UserRole.ADMIN and current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to update this user")
     
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.scalar(select(User).where(User.id == user_id))
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -57,21 +60,29 @@ async def update_user(user_id: int, user: UserUpdate, db: Session = Depends(get_
     if user.role is not None and current_user.role == UserRole.ADMIN:
         db_user.role = user.role
     if user.password is not None:
-        db_user.hashed_password = get_password_hash(user.password)
+        db_user.hashed_password = await get_password_hash(user.password)
+        # Log out every device that signed in with the old password
+        await revoke_user_sessions(db, user_id)
     
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    
+    # The next request on any worker re-reads the user, so a new role applies (and old tokens fail) at once
+    await invalidate_principal(user_id)
     return db_user
 
 @router.delete("/{user_id}", response_model=UserResponse)
-async def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized to delete users")
     
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.scalar(select(User).where(User.id == user_id))
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    db.delete(db_user)
-    db.commit()
+    await delete_refresh_tokens(db, user_id)
+    await forget_user_reads(db, user_id)
+    await db.delete(db_user)
+    await db.commit()
+    await invalidate_principal(user_id)
     return db_user
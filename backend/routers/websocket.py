@@ -0,0 +1,94 @@
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from typing import Optional
+import asyncio
+import json
+from ..database import AsyncSessionLocal
+from ..utils.auth import authenticate_token
+from ..websocket import manager, can_subscribe, default_topics, ENCODINGS
+
+router = APIRouter(tags=["websocket"])
+
+# Seconds a client connecting without ?token= has to send its auth frame
+AUTH_TIMEOUT = 10
+
+async def websocket_user(token: Optional[str]):
+    if not token:
+        return None
+    async with AsyncSessionLocal() as db:
+        try:
+            return await authenticate_token(db, token)
+        except HTTPException:
+            return None
+
+@router.websocket("/ws")
+async def websocket_endpoint(
+    websocket: WebSocket,
+    token: Optional[str] = None,
+    topics: Optional[str] = None,
+    encoding: str = "json",
+    last_seq: Optional[int] = None,
+    epoch: Optional[str] = None,
+):
+    """
+    Event stream for a signed-in user.
+
+    The access token is passed as ``?token=`` or, to keep it out of URLs
+    and logs, in a first frame ``{"type": "auth", "token": "...",
+    "topics": [...]}``. ``topics`` (comma separated in the query string)
+    narrows the subscription; by default a client follows every topic its
+    role allows and its own ``notifications:user:{id}``. ``encoding`` (query
+    or auth frame) picks ``json`` text frames or, if installed on the
+    server, ``msgpack`` binary frames.
+
+    Every event carries a ``seq``. A reconnecting client passes the
+    ``epoch`` from its last ``subscribed`` frame and the last ``seq`` it
+    saw as ``last_seq`` to receive only what it missed.
+
+    After connecting, the client may send the commands described in
+    ``ConnectionManager.handle_command`` (``ping``, ``subscribe``,
+    ``unsubscribe``, ``ack``, ``resume``); other frames are ignored.
+    """
+    requested = topics.split(",") if topics else None
+    if token is None:
+        await websocket.accept()
+        try:
+            message = await asyncio.wait_for(websocket.receive(), AUTH_TIMEOUT)
+            if message["type"] == "websocket.disconnect":
+                return
+            # Accepted as a text or a binary frame; anything but JSON closes with 1008 below
+            frame = json.loads(message.get("text") or message.get("bytes") or "")
+            if frame.get("type") == "auth":
+                token = frame.get("token")
+                if isinstance(frame.get("topics"), list):
+                    requested = frame["topics"]
+                encoding = frame.get("encoding", encoding)
+                epoch = frame.get("epoch", epoch)
+                if isinstance(frame.get("last_seq"), int):
+                    last_seq = frame["last_seq"]
+        except WebSocketDisconnect:
+            return
+        except (asyncio.TimeoutError, ValueError, AttributeError):
+            pass
+
+    user = await websocket_user(token)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    if requested:
+        subscribed = {topic for topic in requested if isinstance(topic, str) and can_subscribe(user, topic)}
+    else:
+        subscribed = default_topics(user)
+    if encoding not in ENCODINGS:
+        encoding = "json"
+    await manager.connect(websocket, user.id, subscribed, encoding, last_seq=last_seq, epoch=epoch)
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            # Binary frames are not commands but still count against the rate limit
+            manager.handle_command(websocket, user, message.get("text") or "")
+    finally:
+        manager.disconnect(websocket)
@@ -29,10 +29,10 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     user: UserResponse
+    refresh_token: Optional[str] = None
 
-class TokenData(BaseModel):
-    email: Optional[str] = None
-    role: Optional[str] = None
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class IngredientBase(BaseModel):
     name: str
@@ -110,6 +110,12 @@ class MealResponse(MealBase):
     class Config:
         orm_mode = True
 
+class MealCapacityResponse(BaseModel):
+    meal_id: int
+    meal_name: str
+    possible_portions: Optional[int] = None  # None for meals without ingredients
+    limiting_ingredient_id: Optional[int] = None
+
 class MealServingBase(BaseModel):
     meal_id: int
     portions: int
@@ -118,6 +124,9 @@ class MealServingBase(BaseModel):
 class MealServingCreate(MealServingBase):
     pass
 
+class MealServingBatchCreate(BaseModel):
+    servings: List[MealServingCreate]
+
 class MealServingResponse(MealServingBase):
     id: int
     created_at: datetime
@@ -156,11 +165,16 @@ class NotificationBase(BaseModel):
     
 class NotificationCreate(NotificationBase):
     user_id: Optional[int] = None
+
+class NotificationUpdate(BaseModel):
+    is_read: Optional[bool] = None
     
 class NotificationResponse(NotificationBase):
     id: int
     user_id: Optional[int]
     is_read: bool
+    ingredient_id: Optional[int] = None
+    alert_kind: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime]
     
@@ -1,40 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from ..database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import jwt
+from pydantic import BaseSettings
+from ..database import get_async_db
 from ..models.models import User
-from ..schemas.schemas import TokenData
+from ..schemas.schemas import UserResponse
+from ..websocket import manager
+from .passwords import password_hasher
+from .refresh_tokens import session_revocations
 
 # JWT Configuration
-SECRET_KEY = "YOUR_SECRET_KEY"  # In production, use a secure key and store in environment variables
+SECRET_KEY = "your-secret-key"  # In production, use a secure key and store in environment variables
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+class AuthSettings(BaseSettings):
+    """Authentication tuning, read from environment variables of the same name."""
+    # Resolved users are trusted for this long before being re-read; update_user
+    # and delete_user drop their entry on every worker through the event bus
+    principal_cache_ttl: int = 60
+    principal_cache_size: int = 1024
 
-def get_user(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user(db, email)
+settings = AuthSettings()
+
+
+class PrincipalCache:
+    """
+    Authenticated users keyed by id, with a TTL and LRU eviction.
+
+    Entries are ``UserResponse`` snapshots, so no ORM object (or password
+    hash) outlives the session that loaded it. Every invalidation bumps
+    ``version``, and a principal read before it is not stored, so a
+    lookup racing a role change or deletion never caches the old user.
+    """
+
+    def __init__(self, ttl: int, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self.version = 0
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+
+    def get(self, user_id: int) -> Optional[UserResponse]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def put(self, principal: UserResponse, version: int):
+        """Store ``principal``, read when the cache was at ``version``, unless it was invalidated since."""
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[principal.id] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self.version += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(settings.principal_cache_ttl, settings.principal_cache_size)
+
+# Name of the principal cache on the event bus
+PRINCIPALS_CACHE = "principals"
+manager.on_invalidate(PRINCIPALS_CACHE, lambda key: principal_cache.invalidate(int(key)))
+
+
+async def invalidate_principal(user_id: int):
+    """Drop a user's cached principal here at once and on the other workers through the event bus."""
+    principal_cache.invalidate(user_id)
+    await manager.invalidate(PRINCIPALS_CACHE, str(user_id))
+
+# Password hashing runs on the bcrypt thread pool, never on the event loop
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
+
+async def get_user(db: AsyncSession, email: str):
+    return await db.scalar(select(User).where(User.email == email))
+
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await get_user(db, email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         return False
     return user
 
+def token_claims(user, session_id: Optional[str] = None) -> dict:
+    """Claims identifying ``user``; id and role let requests authenticate without a query."""
+    claims = {"sub": user.email, "uid": user.id, "role": user.role}
+    if session_id is not None:
+        # Ties the access token to its login, so revoking the login revokes it too
+        claims["sid"] = session_id
+    return claims
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -45,7 +133,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    return await authenticate_token(db, token)
+
+async def authenticate_token(db: AsyncSession, token: str) -> UserResponse:
+    """
+    Resolve an access token to a user, raising 401 if it is not valid.
+
+    Normally answered from ``principal_cache`` without touching the
+    database. A token whose role claim no longer matches the user's role
+    is rejected, so a role change revokes tokens issued before it; so is
+    a token whose login was revoked.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -54,12 +153,27 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
+        user_id: Optional[int] = payload.get("uid")
+        role: Optional[str] = payload.get("role")
+        session_id: Optional[str] = payload.get("sid")
         if email is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
+    except jwt.PyJWTError:
         raise credentials_exception
-    user = get_user(db, email=token_data.email)
-    if user is None:
+
+    if session_id is not None and await session_revocations.is_revoked(db, session_id):
         raise credentials_exception
-    return user
+
+    principal = principal_cache.get(user_id) if user_id is not None else None
+    if principal is None:
+        version = principal_cache.version
+        # Tokens issued before ids were added to the claims are looked up by email
+        user = await db.get(User, user_id) if user_id is not None else await get_user(db, email=email)
+        if user is None:
+            raise credentials_exception
+        principal = UserResponse.from_orm(user)
+        principal_cache.put(principal, version)
+
+    if role is not None and principal.role != role:
+        raise credentials_exception
+    return principal
@@ -0,0 +1,211 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..models.models import Ingredient, Meal, MealIngredient
+from ..websocket import manager
+
+# Writes to these change the shape of the recipe matrix, not just the stock
+RECIPE_MODELS = (Meal, MealIngredient)
+_STOCK_KEY = "serving_capacity_stock"
+_REBUILD_KEY = "serving_capacity_rebuild"
+# Name of the capacity engine on the event bus
+CAPACITY_CACHE = "serving_capacity"
+
+# Absorbs float error so 0.3 kg of stock at 0.1 kg per portion is 3 portions, not 2
+EPSILON = 1e-9
+
+
+def max_portions(recipe: np.ndarray, stock: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Portions each recipe row can be cooked from ``stock`` (the minimum of
+    stock / quantity over the ingredients it uses) and the column of the
+    ingredient that limits it. Rows without ingredients are unlimited:
+    ``inf`` portions and limiting column -1.
+    """
+    if recipe.shape[1] == 0:
+        return np.full(recipe.shape[0], np.inf), np.full(recipe.shape[0], -1, dtype=np.int64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = np.where(recipe > 0, np.maximum(stock, 0.0) / recipe, np.inf)
+    limiting = ratios.argmin(axis=1)
+    portions = np.floor(ratios[np.arange(recipe.shape[0]), limiting] + EPSILON)
+    limiting[~np.isfinite(portions)] = -1
+    return portions, limiting
+
+
+def capacity_payload(meal_ids, meal_names, ingredient_ids, portions, limiting) -> List[Dict[str, Any]]:
+    payload = []
+    for row, meal_id in enumerate(meal_ids.tolist()):
+        col = limiting[row]
+        payload.append({
+            "meal_id": meal_id,
+            "meal_name": meal_names[row],
+            "possible_portions": int(portions[row]) if np.isfinite(portions[row]) else None,
+            "limiting_ingredient_id": int(ingredient_ids[col]) if col >= 0 else None
+        })
+    return payload
+
+
+class ServingCapacity:
+    """
+    Possible portions per meal, kept in memory.
+
+    The recipes are held as a dense meal x ingredient matrix and the stock
+    as a vector, so all meals are computed in one vectorized pass. Stock
+    changes only recompute the meals that use the changed ingredients,
+    found through the ingredient -> meals reverse index. Changes to meals,
+    recipes or the set of ingredients drop the matrix; it is rebuilt from
+    the database on next use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = 0
+        self._loaded = False
+        self._meal_ids = np.zeros(0, dtype=np.int64)
+        self._meal_names: List[str] = []
+        self._ingredient_ids = np.zeros(0, dtype=np.int64)
+        self._ingredient_cols: Dict[int, int] = {}
+        self._recipe = np.zeros((0, 0))
+        self._stock = np.zeros(0)
+        self._portions = np.zeros(0)
+        self._limiting = np.zeros(0, dtype=np.int64)
+        self._meals_by_ingredient: List[np.ndarray] = []
+        self._payload: Optional[List[Dict[str, Any]]] = None
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._loaded = False
+            self._payload = None
+
+    async def load(self, db: AsyncSession) -> List[Dict[str, Any]]:
+        version = self.version
+        meals = (await db.execute(select(Meal.id, Meal.name).order_by(Meal.id))).all()
+        stock = (await db.execute(select(Ingredient.id, Ingredient.quantity).order_by(Ingredient.id))).all()
+        recipe_rows = (await db.execute(
+            select(MealIngredient.meal_id, MealIngredient.ingredient_id, MealIngredient.quantity)
+        )).all()
+
+        meal_rows = {meal_id: row for row, (meal_id, _) in enumerate(meals)}
+        ingredient_cols = {ingredient_id: col for col, (ingredient_id, _) in enumerate(stock)}
+        pairs = [
+            (meal_rows[meal_id], ingredient_cols[ingredient_id], quantity or 0.0)
+            for meal_id, ingredient_id, quantity in recipe_rows
+            if meal_id in meal_rows and ingredient_id in ingredient_cols
+        ]
+
+        recipe = np.zeros((len(meals), len(stock)))
+        if pairs:
+            rows, cols, quantities = (np.array(values) for values in zip(*pairs))
+            # A meal listing an ingredient twice needs the sum, as in meal_requirements
+            np.add.at(recipe, (rows.astype(np.int64), cols.astype(np.int64)), quantities)
+        stock_vector = np.array([quantity or 0.0 for _, quantity in stock], dtype=np.float64)
+        meal_ids = np.array([meal_id for meal_id, _ in meals], dtype=np.int64)
+        meal_names = [name for _, name in meals]
+        ingredient_ids = np.array([ingredient_id for ingredient_id, _ in stock], dtype=np.int64)
+        portions, limiting = max_portions(recipe, stock_vector)
+        payload = capacity_payload(meal_ids, meal_names, ingredient_ids, portions, limiting)
+
+        with self._lock:
+            # Only keep the rebuild if no write committed while it was being read
+            if version == self.version:
+                self._meal_ids = meal_ids
+                self._meal_names = meal_names
+                self._ingredient_ids = ingredient_ids
+                self._ingredient_cols = ingredient_cols
+                self._recipe = recipe
+                self._stock = stock_vector
+                self._portions, self._limiting = portions, limiting
+                self._meals_by_ingredient = [np.flatnonzero(recipe[:, col] > 0) for col in range(len(stock))]
+                self._payload = payload
+                self._loaded = True
+        return payload
+
+    def update_stock(self, quantities: Dict[int, float]):
+        """Apply new ``{ingredient_id: quantity}`` values and recompute the affected meals."""
+        with self._lock:
+            if not self._loaded or any(ingredient_id not in self._ingredient_cols for ingredient_id in quantities):
+                # Nothing to patch, or an ingredient the matrix has not seen yet.
+                # Bumping the version also stops a load racing this write from being stored.
+                self.version += 1
+                self._loaded = False
+                self._payload = None
+                return
+
+            cols = np.array([self._ingredient_cols[ingredient_id] for ingredient_id in quantities], dtype=np.int64)
+            self._stock[cols] = [quantity or 0.0 for quantity in quantities.values()]
+            rows = np.unique(np.concatenate([self._meals_by_ingredient[col] for col in cols]))
+            if rows.size:
+                self._portions[rows], self._limiting[rows] = max_portions(self._recipe[rows], self._stock)
+                self._payload = None
+
+    async def get_all(self, db: AsyncSession) -> List[Dict[str, Any]]:
+        """Possible portions for every meal; only touches the database to (re)build the matrix."""
+        with self._lock:
+            if self._loaded:
+                if self._payload is None:
+                    self._payload = capacity_payload(self._meal_ids, self._meal_names, self._ingredient_ids, self._portions, self._limiting)
+                return self._payload
+        return await self.load(db)
+
+
+serving_capacity = ServingCapacity()
+# Other workers' changes are not patched in: stock values published by two
+# workers could arrive out of order, so the matrix is reloaded instead
+manager.on_invalidate(CAPACITY_CACHE, lambda key: serving_capacity.invalidate())
+
+
+def record_stock(session, quantities: Dict[int, float]):
+    """Remember stock values written by a bulk UPDATE; applied once the transaction commits."""
+    session.info.setdefault(_STOCK_KEY, {}).update(quantities)
+
+
+# Sessions collect the ingredient quantities they write and whether recipes
+# changed; the engine is updated once that transaction commits, and the
+# other workers are told to reload theirs.
+@event.listens_for(Session, "after_flush")
+def _track_capacity_flush(session, flush_context):
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, RECIPE_MODELS + (Ingredient,)):
+            session.info[_REBUILD_KEY] = True
+    for obj in session.dirty:
+        if isinstance(obj, RECIPE_MODELS):
+            session.info[_REBUILD_KEY] = True
+        elif isinstance(obj, Ingredient) and inspect(obj).attrs.quantity.history.has_changes():
+            record_stock(session, {obj.id: obj.quantity})
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_capacity_bulk_write(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None:
+        return
+    # Bulk ingredient updates report their new quantities through record_stock
+    if issubclass(mapper.class_, RECIPE_MODELS) or (orm_execute_state.is_delete and issubclass(mapper.class_, Ingredient)):
+        orm_execute_state.session.info[_REBUILD_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _update_capacity_on_commit(session):
+    stock = session.info.pop(_STOCK_KEY, None)
+    if session.info.pop(_REBUILD_KEY, False):
+        serving_capacity.invalidate()
+    elif stock:
+        serving_capacity.update_stock(stock)
+    else:
+        return
+    manager.invalidate_soon(CAPACITY_CACHE)
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_capacity_changes(session):
+    session.info.pop(_STOCK_KEY, None)
+    session.info.pop(_REBUILD_KEY, None)
@@ -0,0 +1,182 @@
+import json
+import os
+from bisect import bisect_right
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from pydantic import BaseSettings
+
+
+class EventLogSettings(BaseSettings):
+    """WebSocket replay log, read from environment variables of the same name."""
+    # Recent events kept in memory for clients that reconnect
+    ws_event_log_size: int = 2000
+    # Optional file that events leaving memory are appended to, extending
+    # how far back a client can resume; rotated after this many events. Each
+    # worker process writes its own file, named with a ".<pid>" suffix
+    ws_event_spill_path: Optional[str] = None
+    ws_event_spill_max_events: int = 50000
+
+
+settings = EventLogSettings()
+
+# (sequence number, bus target, frame text)
+Event = Tuple[int, str, str]
+
+# A spill file's byte offset is remembered every this many events, so a
+# resume seeks close to its position instead of reading the file from the top
+SPILL_INDEX_EVERY = 256
+
+
+class EventLog:
+    """
+    The most recent events in sequence order, for resuming clients.
+
+    ``size`` events are kept in a ring buffer. With ``spill_path`` set,
+    events pushed out of the ring are appended to that file, which is
+    rotated once to ``<spill_path>.1`` after ``spill_max_events``. ``since``
+    answers from both, or None when the client has fallen out of the
+    window and must reload its data instead. Reading the spill files
+    starts from the nearest indexed offset, so it costs about as much as
+    the events it returns.
+
+    Every sequence number the bus delivers is recorded, including those
+    that carry no event (``skip``), so the log knows which range it covers:
+    a number jumping past the one expected, or events lost to ``lose``,
+    moves the start of that range up and older positions must resync.
+    """
+
+    def __init__(self, size: int, spill_path: Optional[str] = None, spill_max_events: int = 50000):
+        self.size = size
+        self.spill_path = spill_path
+        self.spill_max_events = spill_max_events
+        self._events: Deque[Event] = deque()
+        self.last_seq = 0
+        # Every event numbered from here on is kept; None until the first number
+        self._covered_from: Optional[int] = None
+        self._spill_file = None
+        self._spill_count = 0
+        self._spill_bytes = 0
+        # First sequence number in the current spill file, and the last in
+        # the current and the rotated one
+        self._spill_first: Optional[int] = None
+        self._spill_last: Optional[int] = None
+        self._rotated_last: Optional[int] = None
+        # Sparse (sequence number, byte offset) index of each file
+        self._spill_index: List[Tuple[int, int]] = []
+        self._rotated_index: List[Tuple[int, int]] = []
+        if spill_path:
+            # Sequence numbers from an earlier process cannot be trusted to line up
+            for path in (spill_path, spill_path + ".1"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    @property
+    def first_seq(self) -> Optional[int]:
+        """Oldest sequence number that can still be replayed."""
+        return self._covered_from
+
+    def _seen(self, seq: int):
+        if self._covered_from is None or seq > self.last_seq + 1:
+            # Nothing from before the first number, or numbers were missed
+            self._covered_from = seq
+        self.last_seq = max(self.last_seq, seq)
+
+    def _forget(self, seq: int):
+        self._covered_from = max(self._covered_from, seq + 1)
+
+    def append(self, seq: int, target: str, text: str):
+        self._seen(seq)
+        self._events.append((seq, target, text))
+        while len(self._events) > self.size:
+            evicted = self._events.popleft()
+            if self.spill_path:
+                self._spill(evicted)
+            else:
+                self._forget(evicted[0])
+
+    def skip(self, seq: int):
+        """Record a sequence number that carried no event for clients (e.g. a cache invalidation)."""
+        self._seen(seq)
+
+    def lose(self, seq: int):
+        """Events up to ``seq`` may never have arrived; resuming from before it needs a resync."""
+        if seq > self.last_seq:
+            self.last_seq = seq
+            self._covered_from = seq + 1
+
+    def _spill(self, event: Event):
+        if self._spill_count >= self.spill_max_events:
+            self._spill_file.close()
+            os.replace(self.spill_path, self.spill_path + ".1")
+            if self._rotated_last is not None:
+                # The old rotated file was just overwritten
+                self._forget(self._rotated_last)
+            self._rotated_last, self._spill_first = self._spill_last, None
+            self._rotated_index, self._spill_index = self._spill_index, []
+            self._spill_file = None
+            self._spill_count = 0
+            self._spill_bytes = 0
+        if self._spill_file is None:
+            self._spill_file = open(self.spill_path, "ab")
+        if self._spill_first is None:
+            self._spill_first = event[0]
+        if self._spill_count % SPILL_INDEX_EVERY == 0:
+            self._spill_index.append((event[0], self._spill_bytes))
+        # One JSON array per line; frame text may itself contain newlines
+        line = (json.dumps(event) + "\n").encode("utf-8")
+        self._spill_file.write(line)
+        self._spill_count += 1
+        self._spill_bytes += len(line)
+        self._spill_last = event[0]
+
+    def _read_spill(self, after: int) -> List[Event]:
+        if self._spill_file is None:
+            return []
+        self._spill_file.flush()
+        files = [(self.spill_path + ".1", self._rotated_index), (self.spill_path, self._spill_index)]
+        if self._spill_first is not None and after + 1 >= self._spill_first:
+            # Everything wanted is in the current file
+            files = files[1:]
+        events = []
+        for path, index in files:
+            if not index or not os.path.exists(path):
+                continue
+            # Start from the last indexed event at or before the first wanted one
+            position = max(bisect_right(index, (after + 1, float("inf"))) - 1, 0)
+            with open(path, "rb") as f:
+                f.seek(index[position][1])
+                for line in f:
+                    seq, target, text = json.loads(line)
+                    if seq > after:
+                        events.append((seq, target, text))
+        return events
+
+    def since(self, seq: int) -> Optional[List[Event]]:
+        """Events after ``seq`` in order, or None if some of them are no longer kept."""
+        if seq > self.last_seq:
+            # From before a restart of the sequence
+            return None
+        if seq == self.last_seq:
+            return []
+        first = self.first_seq
+        if first is None or seq + 1 < first:
+            return None
+        events = []
+        if self.spill_path and self._events and seq + 1 < self._events[0][0]:
+            events.extend(self._read_spill(seq))
+        events.extend(event for event in self._events if event[0] > seq)
+        return events
+
+    def close(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+
+def create_event_log() -> EventLog:
+    # Workers sharing one WS_EVENT_SPILL_PATH would wipe and rotate each other's files
+    spill_path = settings.ws_event_spill_path
+    if spill_path:
+        spill_path = f"{spill_path}.{os.getpid()}"
+    return EventLog(settings.ws_event_log_size, spill_path, settings.ws_event_spill_max_events)
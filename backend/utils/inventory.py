@@ -0,0 +1,94 @@
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import case, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import Ingredient, MealIngredient
+from .capacity import record_stock
+from .stock_alerts import record_stock_change, stock_level, stock_status_expr
+
+
+class InsufficientStockError(Exception):
+    """Raised when a deduction would take an ingredient below zero."""
+
+    def __init__(self, detail: str, ingredient_id: int):
+        super().__init__(detail)
+        self.detail = detail
+        self.ingredient_id = ingredient_id
+
+
+async def meal_requirements(db: AsyncSession, meal_portions: Dict[int, int]) -> Dict[int, float]:
+    """
+    Sum the ingredients needed for ``{meal_id: portions}`` into
+    ``{ingredient_id: quantity}`` using a single query over the recipes.
+    """
+    if not meal_portions:
+        return {}
+
+    rows = await db.execute(
+        select(MealIngredient.meal_id, MealIngredient.ingredient_id, MealIngredient.quantity)
+        .where(MealIngredient.meal_id.in_(list(meal_portions)))
+    )
+
+    required: Dict[int, float] = {}
+    for meal_id, ingredient_id, quantity in rows:
+        required[ingredient_id] = required.get(ingredient_id, 0) + quantity * meal_portions[meal_id]
+    return required
+
+
+async def deduct_stock(db: AsyncSession, required: Dict[int, float]):
+    """
+    Subtract ``{ingredient_id: quantity}`` from stock with one conditional UPDATE.
+
+    A row is only decremented if it still holds enough stock, so concurrent
+    servings cannot both pass the check. If any ingredient is short the
+    transaction is rolled back and ``InsufficientStockError`` is raised;
+    otherwise the caller commits. The new quantities are handed to the
+    serving-capacity engine and the stock alerts for when that commit lands.
+    """
+    if not required:
+        return
+
+    amount = case(required, value=Ingredient.id)
+    remaining = Ingredient.quantity - amount
+    now = datetime.utcnow()
+    # Stock only goes down here, so an Expired or similar status is kept
+    status = stock_status_expr(remaining, Ingredient.threshold, else_=Ingredient.status)
+    result = await db.execute(
+        update(Ingredient)
+        .where(Ingredient.id.in_(list(required)), Ingredient.quantity >= amount)
+        .values(
+            quantity=remaining,
+            status=status,
+            status_changed_at=case((Ingredient.status.is_distinct_from(status), now), else_=Ingredient.status_changed_at),
+            updated_at=now
+        )
+        .returning(Ingredient.id, Ingredient.quantity, Ingredient.name, Ingredient.unit, Ingredient.threshold)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    if len(rows) == len(required):
+        record_stock(db, {ingredient_id: quantity for ingredient_id, quantity, *_ in rows})
+        for ingredient_id, quantity, name, unit, threshold in rows:
+            old_level = stock_level(quantity + required[ingredient_id], threshold)
+            record_stock_change(db, ingredient_id, name, unit, threshold, quantity, old_level)
+        return
+
+    # Some rows did not match: undo the ones that did and report the first shortage
+    await db.rollback()
+    ingredients = {
+        ingredient.id: ingredient
+        for ingredient in await db.scalars(select(Ingredient).where(Ingredient.id.in_(list(required))))
+    }
+    for ingredient_id, required_quantity in required.items():
+        ingredient = ingredients.get(ingredient_id)
+        if ingredient is None:
+            raise InsufficientStockError(f"Ingredient with id {ingredient_id} not found", ingredient_id)
+        if ingredient.quantity < required_quantity:
+            raise InsufficientStockError(
+                f"Not enough {ingredient.name} in stock. Need {required_quantity} {ingredient.unit}, but have {ingredient.quantity} {ingredient.unit}",
+                ingredient_id
+            )
+    # Stock was replenished between the UPDATE and the re-read
+    raise InsufficientStockError("Inventory changed while serving, please retry", next(iter(required)))
@@ -0,0 +1,160 @@
+import threading
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+
+from ..models.models import Ingredient, Meal, MealIngredient
+from ..websocket import manager
+from .pagination import CursorKey, cursor_key
+
+# Mappers whose writes change what the meal catalog returns
+CATALOG_MODELS = (Meal, MealIngredient, Ingredient)
+_DIRTY_KEY = "meal_catalog_dirty"
+# Name of the catalog on the event bus
+CATALOG_CACHE = "meal_catalog"
+
+
+def serialize_meal(meal: Meal) -> Dict[str, Any]:
+    """Build the MealResponse payload for a meal with its ingredients loaded."""
+    ingredients = []
+    for mi in meal.meal_ingredients:
+        if mi.ingredient is None:
+            continue
+        ingredients.append({
+            "id": mi.id,
+            "ingredient_id": mi.ingredient_id,
+            "ingredient_name": mi.ingredient.name,
+            "quantity": mi.quantity,
+            "unit": mi.ingredient.unit
+        })
+
+    return {
+        "id": meal.id,
+        "name": meal.name,
+        "description": meal.description,
+        "image_url": meal.image_url,
+        "created_at": meal.created_at,
+        "updated_at": meal.updated_at,
+        "ingredients": ingredients
+    }
+
+
+def meals_with_ingredients():
+    """Meals with their ingredient rows joined in, so one query loads a whole page."""
+    return select(Meal).options(
+        joinedload(Meal.meal_ingredients).joinedload(MealIngredient.ingredient)
+    ).order_by(Meal.created_at, Meal.id).execution_options(populate_existing=True)
+
+
+async def load_meal(db: AsyncSession, meal_id: int) -> Optional[Dict[str, Any]]:
+    result = await db.execute(meals_with_ingredients().where(Meal.id == meal_id))
+    db_meal = result.unique().scalars().first()
+    if db_meal is None:
+        return None
+    return serialize_meal(db_meal)
+
+
+async def find_missing_ingredient(db: AsyncSession, ingredient_data: Iterable[Dict[str, Any]]) -> Optional[int]:
+    """Return the first requested ingredient id that does not exist, checked in one query."""
+    requested = [item.get("ingredient_id") for item in ingredient_data]
+    if not requested:
+        return None
+
+    found = set(await db.scalars(select(Ingredient.id).where(Ingredient.id.in_(set(requested)))))
+    for ingredient_id in requested:
+        if ingredient_id not in found:
+            return ingredient_id
+    return None
+
+
+class MealCatalogCache:
+    """
+    Serialized meal catalog kept in process memory.
+
+    Every committed write to meals, meal ingredients or ingredients bumps
+    ``version`` and drops the cached copy. A rebuild is only stored if the
+    version did not move while it was being read, so a reader racing a
+    writer never pins stale data.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = 0
+        self._meals: Optional[List[Dict[str, Any]]] = None
+        self._meals_by_id: Dict[int, Dict[str, Any]] = {}
+        self._keys: List[CursorKey] = []
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._meals = None
+            self._meals_by_id = {}
+            self._keys = []
+
+    async def get_all(self, db: AsyncSession) -> List[Dict[str, Any]]:
+        meals = self._meals
+        if meals is not None:
+            return meals
+
+        version = self.version
+        result = await db.execute(meals_with_ingredients())
+        meals = [serialize_meal(meal) for meal in result.unique().scalars()]
+
+        with self._lock:
+            if version == self.version:
+                self._meals = meals
+                self._meals_by_id = {meal["id"]: meal for meal in meals}
+                self._keys = [cursor_key(meal["created_at"], meal["id"]) for meal in meals]
+        return meals
+
+    async def get(self, db: AsyncSession, meal_id: int) -> Optional[Dict[str, Any]]:
+        if self._meals is None:
+            meals = await self.get_all(db)
+            return next((meal for meal in meals if meal["id"] == meal_id), None)
+        return self._meals_by_id.get(meal_id)
+
+    async def get_page(self, db: AsyncSession, after: Optional[CursorKey], limit: int) -> List[Dict[str, Any]]:
+        """Up to ``limit + 1`` meals following ``after`` in (created_at, id) order."""
+        meals = await self.get_all(db)
+        keys = self._keys if meals is self._meals else [cursor_key(meal["created_at"], meal["id"]) for meal in meals]
+        start = bisect_right(keys, after) if after else 0
+        return meals[start:start + limit + 1]
+
+
+meal_catalog = MealCatalogCache()
+manager.on_invalidate(CATALOG_CACHE, lambda key: meal_catalog.invalidate())
+
+
+# Cache invalidation: sessions remember whether they touched catalog tables
+# and the cache is dropped once that transaction commits, here at once and
+# on the other workers through the event bus.
+@event.listens_for(Session, "after_flush")
+def _track_catalog_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, CATALOG_MODELS):
+            session.info[_DIRTY_KEY] = True
+            return
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_catalog_bulk_write(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, CATALOG_MODELS):
+        orm_execute_state.session.info[_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_catalog_on_commit(session):
+    if session.info.pop(_DIRTY_KEY, False):
+        meal_catalog.invalidate()
+        manager.invalidate_soon(CATALOG_CACHE)
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_catalog_flag(session):
+    session.info.pop(_DIRTY_KEY, None)
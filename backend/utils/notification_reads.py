@@ -0,0 +1,294 @@
+import json
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, case, delete, exists, func, literal, or_, select, true, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import (
+    BROADCAST_TOTAL, Counter, Notification, NotificationCounter, NotificationRead, NotificationWatermark
+)
+
+# A notification addressed to one user carries its own is_read. A broadcast
+# (user_id NULL) is stored once; each user's read state for broadcasts is a
+# watermark (every broadcast id <= last_read_id is read) plus the read-set of
+# newer broadcasts they marked read one by one.
+#
+# Unread counts are kept as counters rather than counted: NotificationCounter
+# per user and the BROADCAST_TOTAL Counter. Every statement that inserts,
+# reads or deletes notifications adjusts them in the same transaction with
+# ``x = x + n`` updates. A missing row is built from the tables the first
+# time it is asked for (see ``unread_count``); until then the updates simply
+# match nothing.
+
+# Tells clients to refetch their unread count: the broadcasts changed for everyone
+_UNREAD_COUNT_CHANGED = json.dumps({"type": "unread_count_changed"})
+
+
+def watermark(user_id: int):
+    """The user's ``last_read_id`` as a scalar subquery, 0 if they never marked all read."""
+    return func.coalesce(
+        select(NotificationWatermark.last_read_id)
+        .where(NotificationWatermark.user_id == user_id)
+        # user_id may be a column of an outer statement (see forget_broadcast_reads)
+        .correlate_except(NotificationWatermark)
+        .scalar_subquery(),
+        0
+    )
+
+
+def _in_read_set(user_id: int):
+    return (
+        exists()
+        .where(NotificationRead.user_id == user_id, NotificationRead.notification_id == Notification.id)
+        .correlate_except(NotificationRead)
+    )
+
+
+def unread_broadcasts(user_id: int):
+    """Broadcasts the user has not read: an id range above the watermark, minus the read-set."""
+    return and_(Notification.user_id.is_(None), Notification.id > watermark(user_id), ~_in_read_set(user_id))
+
+
+def unread_filter(user_id: int, everyone: bool = False):
+    """
+    Notifications ``user_id`` has not read: their own unread ones and the
+    unread broadcasts. With ``everyone``, other users' unread notifications
+    are included too (admins and managers see every notification).
+    """
+    own = Notification.user_id.isnot(None) if everyone else Notification.user_id == user_id
+    return or_(and_(own, Notification.is_read == False), unread_broadcasts(user_id))
+
+
+def is_read_expr(user_id: int):
+    """Whether a notification is read, as seen by ``user_id``."""
+    return case(
+        (Notification.user_id.is_(None), or_(Notification.id <= watermark(user_id), _in_read_set(user_id))),
+        else_=Notification.is_read
+    )
+
+
+def _insert(db: AsyncSession):
+    # INSERT ... ON CONFLICT exists in both supported databases, under different imports
+    return postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+
+
+async def _set_watermark(db: AsyncSession, user_id: int, last_read_id: int):
+    now = datetime.utcnow()
+    statement = _insert(db)(NotificationWatermark).values(user_id=user_id, last_read_id=last_read_id, updated_at=now)
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[NotificationWatermark.user_id],
+        set_={"last_read_id": statement.excluded.last_read_id, "updated_at": now},
+    ))
+
+
+async def mark_all_read(db: AsyncSession, user_id: int) -> int:
+    """
+    Mark everything the user can see as read; the caller commits.
+
+    The user's own notifications are flagged in place. Broadcasts are
+    covered by moving the watermark up to the newest one with a single
+    upsert, whatever their number; the read-set below it is no longer
+    needed. The counters move by exactly what changed, so notifications
+    added meanwhile stay counted. Returns how many notifications became read.
+    """
+    result = await db.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read == False)
+        .values(is_read=True, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    own = result.rowcount
+
+    broadcasts = 0
+    last_id = await db.scalar(select(func.max(Notification.id)).where(Notification.user_id.is_(None)))
+    if last_id is not None:
+        broadcasts = await db.scalar(
+            select(func.count()).select_from(Notification)
+            .where(unread_broadcasts(user_id), Notification.id <= last_id)
+        )
+        await _set_watermark(db, user_id, last_id)
+        await db.execute(
+            delete(NotificationRead)
+            .where(NotificationRead.user_id == user_id, NotificationRead.notification_id <= last_id)
+        )
+    await _add_counts(db, user_id, unread=-own, broadcasts_read=broadcasts)
+    return own + broadcasts
+
+
+async def set_broadcast_read(db: AsyncSession, user_id: int, notification_id: int, is_read: bool):
+    """Mark one broadcast read or unread for ``user_id`` only; the caller commits."""
+    last_read_id = await db.scalar(select(watermark(user_id)))
+    if is_read:
+        if notification_id > last_read_id:
+            result = await db.execute(
+                _insert(db)(NotificationRead)
+                .values(user_id=user_id, notification_id=notification_id, created_at=datetime.utcnow())
+                .on_conflict_do_nothing()
+            )
+            if result.rowcount:
+                await _add_counts(db, user_id, broadcasts_read=1)
+        return
+
+    result = await db.execute(
+        delete(NotificationRead)
+        .where(NotificationRead.user_id == user_id, NotificationRead.notification_id == notification_id)
+    )
+    if result.rowcount:
+        await _add_counts(db, user_id, broadcasts_read=-1)
+    if notification_id <= last_read_id:
+        await _add_counts(db, user_id, broadcasts_read=-1)
+        # Lower the watermark below it and keep the broadcasts in between read
+        await db.execute(
+            _insert(db)(NotificationRead).from_select(
+                ["user_id", "notification_id", "created_at"],
+                select(literal(user_id), Notification.id, literal(datetime.utcnow())).where(
+                    Notification.user_id.is_(None),
+                    Notification.id > notification_id,
+                    Notification.id <= last_read_id,
+                )
+            ).on_conflict_do_nothing()
+        )
+        await _set_watermark(db, user_id, notification_id - 1)
+
+
+async def forget_user_reads(db: AsyncSession, user_id: int):
+    """Drop a user's broadcast read state and counters before the user is deleted; the caller commits."""
+    await db.execute(delete(NotificationCounter).where(NotificationCounter.user_id == user_id))
+    await db.execute(delete(NotificationRead).where(NotificationRead.user_id == user_id))
+    await db.execute(delete(NotificationWatermark).where(NotificationWatermark.user_id == user_id))
+
+
+async def forget_broadcast_reads(db: AsyncSession, notification_ids):
+    """
+    Drop the read state of broadcasts being deleted; the caller commits.
+
+    The broadcast total goes down by their number, and each user's
+    ``broadcasts_read`` by how many of them that user had read.
+    """
+    notification_ids = list(notification_ids)
+    read_by_user = (
+        select(func.count())
+        .select_from(Notification)
+        .where(
+            Notification.id.in_(notification_ids),
+            Notification.user_id.is_(None),
+            or_(Notification.id <= watermark(NotificationCounter.user_id), _in_read_set(NotificationCounter.user_id)),
+        )
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(NotificationCounter)
+        .values(broadcasts_read=NotificationCounter.broadcasts_read - read_by_user)
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(Counter)
+        .where(Counter.name == BROADCAST_TOTAL)
+        .values(value=Counter.value - len(notification_ids))
+    )
+    await db.execute(delete(NotificationRead).where(NotificationRead.notification_id.in_(notification_ids)))
+
+
+def _broadcast_total():
+    return select(Counter.value).where(Counter.name == BROADCAST_TOTAL).scalar_subquery()
+
+
+async def _add_counts(db: AsyncSession, user_id: int, unread: int = 0, broadcasts_read: int = 0):
+    await db.execute(
+        update(NotificationCounter)
+        .where(NotificationCounter.user_id == user_id)
+        .values(
+            unread=NotificationCounter.unread + unread,
+            broadcasts_read=NotificationCounter.broadcasts_read + broadcasts_read,
+        )
+    )
+
+
+async def add_unread(db: AsyncSession, user_id: int, delta: int):
+    """Count ``delta`` more (or, negative, fewer) unread notifications of the user's own; the caller commits."""
+    await _add_counts(db, user_id, unread=delta)
+
+
+async def count_new_notifications(db: AsyncSession, user_ids: Iterable[Optional[int]]):
+    """
+    Count notifications just inserted, one ``user_id`` each (None for a
+    broadcast), in the inserting transaction; the caller commits.
+    """
+    per_user = {}
+    for user_id in user_ids:
+        per_user[user_id] = per_user.get(user_id, 0) + 1
+    broadcasts = per_user.pop(None, 0)
+    if broadcasts:
+        await db.execute(
+            update(Counter)
+            .where(Counter.name == BROADCAST_TOTAL)
+            .values(value=Counter.value + broadcasts)
+        )
+    for user_id, count in per_user.items():
+        await _add_counts(db, user_id, unread=count)
+
+
+async def unread_count(db: AsyncSession, user_id: int) -> int:
+    """
+    How many notifications ``user_id`` has not read, from the counters.
+
+    Counters that do not exist yet (a new user, a database from before
+    them) are built and committed, each by a single INSERT ... SELECT
+    that counts and inserts in one statement, so no notification written
+    between a separate COUNT and INSERT is missed.
+    """
+    row = (await db.execute(
+        select(NotificationCounter.unread, NotificationCounter.broadcasts_read, _broadcast_total())
+        .where(NotificationCounter.user_id == user_id)
+    )).first()
+    if row is not None and row[2] is not None:
+        return row[0] + row[2] - row[1]
+
+    # A no-op when the total exists, which it does after the first call
+    await db.execute(
+        _insert(db)(Counter).from_select(
+            ["name", "value"],
+            select(literal(BROADCAST_TOTAL), func.count())
+            .select_from(Notification)
+            .where(Notification.user_id.is_(None))
+        ).on_conflict_do_nothing()
+    )
+    if row is None:
+        unread = (
+            select(func.count()).select_from(Notification)
+            .where(Notification.user_id == user_id, Notification.is_read == False)
+            .scalar_subquery()
+        )
+        unread_broadcast_count = (
+            select(func.count()).select_from(Notification).where(unread_broadcasts(user_id)).scalar_subquery()
+        )
+        await db.execute(
+            _insert(db)(NotificationCounter).from_select(
+                ["user_id", "unread", "broadcasts_read"],
+                # WHERE true: SQLite needs it to parse INSERT ... SELECT ... ON CONFLICT
+                select(literal(user_id), unread, _broadcast_total() - unread_broadcast_count).where(true())
+            ).on_conflict_do_nothing()
+        )
+    await db.commit()
+    return await unread_count(db, user_id)
+
+
+async def push_unread_counts(db: AsyncSession, user_ids: Iterable[Optional[int]]):
+    """
+    After a commit that changed the counts of ``user_ids``, send each of
+    them their new count; None (broadcasts changed) sends every client on
+    the notifications topic an ``unread_count_changed`` instead.
+    """
+    # Imported here: the websocket module imports the notification writer, which uses this module
+    from ..websocket import manager
+
+    user_ids = set(user_ids)
+    if None in user_ids:
+        user_ids.discard(None)
+        await manager.broadcast(_UNREAD_COUNT_CHANGED, topic="notifications", save_to_db=False, key="unread_count")
+    for user_id in user_ids:
+        count = await unread_count(db, user_id)
+        await manager.send_to_user(json.dumps({"type": "unread_count", "unread": count}), user_id)
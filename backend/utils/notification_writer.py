@@ -0,0 +1,155 @@
+import asyncio
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseSettings
+from sqlalchemy import insert
+
+from ..database import AsyncSessionLocal
+from ..models.models import Notification
+from .notification_reads import count_new_notifications, push_unread_counts
+
+
+class NotificationWriterSettings(BaseSettings):
+    """Background notification writer, read from environment variables of the same name."""
+    # A batch is written when it is this old or this large, whichever comes first
+    notification_flush_ms: int = 200
+    notification_batch_size: int = 200
+    # Notifications waiting to be written before new ones are dropped
+    notification_max_queue: int = 10000
+
+
+settings = NotificationWriterSettings()
+
+# Tells the writer task to write what it has and exit
+_STOP = object()
+
+
+def notification_record(message: str, created_at: datetime) -> dict:
+    """Column values for the notification stored alongside a broadcast message."""
+    data = json.loads(message)
+    # Determine user_id (if any)
+    user_id = data.get('data', {}).get('user_id')
+    # Get the sender information
+    sender_id = None
+    if 'user' in data:
+        sender_id = data['user'].get('id')
+    return {
+        "user_id": user_id,  # Can be None for broadcast to all
+        "message": data.get('message', 'New notification'),
+        "notification_type": data.get('type', 'system'),
+        "is_read": False,
+        "created_by": sender_id,
+        "created_at": created_at,
+    }
+
+
+class NotificationWriter:
+    """
+    Persists broadcast notifications in batches from a background task.
+
+    ``submit`` only queues the message, so a request never waits on the
+    insert. The task writes each batch with one multi-row INSERT and one
+    commit once it is ``flush_ms`` old or ``batch_size`` long; ``stop``
+    writes whatever is still queued.
+    """
+
+    def __init__(self, flush_ms: int, batch_size: int, max_queue: int):
+        self.flush_ms = flush_ms
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+        }
+
+    def submit(self, message: str):
+        """Queue a broadcast message for storage; never blocks."""
+        if self._task is None:
+            # Started on first use so it runs on the server's event loop
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        if self._queue.qsize() >= self.max_queue:
+            self.dropped += 1
+            print("Notification queue full, dropping notification")
+            return
+        self._queue.put_nowait((message, datetime.utcnow()))
+
+    async def _run(self):
+        queue = self._queue
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_ms / 1000
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._write(batch)
+
+    async def _write(self, batch: List[tuple]):
+        records = []
+        for message, created_at in batch:
+            try:
+                records.append(notification_record(message, created_at))
+            except (ValueError, AttributeError) as e:
+                print(f"Error saving notification to database: {e}")
+        if not records:
+            return
+        try:
+            async with AsyncSessionLocal() as db:
+                user_ids = [record["user_id"] for record in records]
+                await db.execute(insert(Notification), records)
+                await count_new_notifications(db, user_ids)
+                await db.commit()
+            self.written += len(records)
+            self.batches += 1
+        except Exception as e:
+            self.dropped += len(records)
+            print(f"Error saving notification to database: {e}")
+            return
+
+        try:
+            async with AsyncSessionLocal() as db:
+                await push_unread_counts(db, user_ids)
+        except Exception as e:
+            print(f"Error sending unread counts: {e}")
+
+    async def stop(self):
+        """Write every queued notification, then stop the task until the next submit."""
+        if self._task is None:
+            return
+        task, queue = self._task, self._queue
+        # A submit from here on starts a new task with its own queue
+        self._task = None
+        queue.put_nowait(_STOP)
+        await task
+        if self._queue is queue:
+            self._queue = None
+
+
+notification_writer = NotificationWriter(
+    settings.notification_flush_ms, settings.notification_batch_size, settings.notification_max_queue
+)
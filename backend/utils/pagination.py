@@ -0,0 +1,66 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import literal, tuple_
+
+# List endpoints return the cursor for the following page in this header
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+CursorKey = Tuple[datetime, int]
+
+
+def cursor_key(created_at: Optional[datetime], row_id: int) -> CursorKey:
+    # Only for lists paged in memory (the meal catalog). Tables paged in SQL
+    # have created_at NOT NULL, since the seek below never matches a NULL.
+    return (created_at or datetime.min, row_id)
+
+
+def encode_cursor(created_at: Optional[datetime], row_id: int) -> str:
+    created_at, row_id = cursor_key(created_at, row_id)
+    payload = json.dumps([created_at.isoformat(), row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> CursorKey:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_page(query, model, cursor: Optional[str], limit: int, descending: bool = False):
+    """
+    Order ``query`` by ``(created_at, id)`` and continue after ``cursor``.
+
+    One extra row is fetched so ``finish_page`` can tell whether another
+    page exists. The seek is an index range scan, so deep pages cost the
+    same as the first one.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        key = tuple_(model.created_at, model.id)
+        after = tuple_(literal(created_at, model.created_at.type), literal(row_id, model.id.type))
+        query = query.where(key < after if descending else key > after)
+
+    if descending:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at, model.id)
+    return query.limit(limit + 1)
+
+
+def row_key(row) -> CursorKey:
+    return row.created_at, row.id
+
+
+def finish_page(response: Response, rows: List[Any], limit: int, key: Callable[[Any], CursorKey] = row_key) -> List[Any]:
+    """Drop the look-ahead row and advertise the next cursor, if there is one."""
+    if limit > 0 and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(rows[-1]))
+    return rows
@@ -0,0 +1,98 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from pydantic import BaseSettings
+
+
+class PasswordHashingSettings(BaseSettings):
+    """Password hashing pool, read from environment variables of the same name."""
+    # Threads running bcrypt; 0 runs it inline on the event loop (benchmark baseline only)
+    password_hash_workers: int = min(4, os.cpu_count() or 1)
+    # Operations allowed to wait for a free thread before new ones get a 503
+    password_hash_max_queue: int = 64
+
+
+settings = PasswordHashingSettings()
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated, bounded thread pool.
+
+    A bcrypt round takes ~200 ms of CPU; called from an ``async def``
+    handler it freezes every request and WebSocket on the worker. bcrypt
+    releases the GIL, so a few threads hash in parallel while the event
+    loop keeps serving. At most ``workers`` operations run at once and at
+    most ``max_queue`` wait behind them; beyond that callers get a 503
+    instead of piling up.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Operations waiting for a free thread."""
+        return max(0, self.in_flight - self.workers)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Created on first use so forked workers each start their own threads
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, func: Callable[..., Any], *args) -> Any:
+        if self.workers <= 0:
+            result = func(*args)
+            self.completed += 1
+            return result
+
+        if self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many logins in progress, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(pwd_context.verify, plain_password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_max_queue)
@@ -0,0 +1,137 @@
+import asyncio
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from pydantic import BaseSettings
+
+
+class PubSubSettings(BaseSettings):
+    """WebSocket event bus, read from environment variables of the same name."""
+    # "memory://" keeps events inside this process (single worker, tests);
+    # a redis:// URL shares them between every worker using the same URL
+    ws_pubsub_url: str = "memory://"
+    ws_pubsub_channel: str = "kindergarten:events"
+
+
+settings = PubSubSettings()
+
+# Called with each payload and the sequence number the bus gave it
+Handler = Callable[[int, str], Awaitable[None]]
+# Called with the bus's latest sequence number when payloads up to it may
+# have been published while this worker was not listening
+GapHandler = Callable[[int], None]
+
+
+class MemoryPubSub:
+    """
+    Delivers each published payload straight back to this process's handler.
+
+    Sequence numbers restart with the process, so each process has its own
+    ``epoch``.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+        self._seq = 0
+        self.epoch = uuid.uuid4().hex
+
+    async def start(self, handler: Handler, on_gap: Optional[GapHandler] = None):
+        # Nothing is published while this process is not listening
+        self._handler = handler
+
+    async def publish(self, payload: str):
+        self._seq += 1
+        if self._handler is not None:
+            await self._handler(self._seq, payload)
+
+    async def stop(self):
+        self._handler = None
+
+
+class RedisPubSub:
+    """
+    Shares payloads between workers over a Redis channel.
+
+    Every worker subscribes to the channel and delivers what it receives
+    to its own sockets, including what it published itself, so a payload
+    is published once and fanned out once per worker. Sequence numbers
+    come from a Redis counter incremented in the same script that
+    publishes, so every worker sees the same numbers in the same order.
+    Each time it (re)subscribes, the counter's value is passed to
+    ``on_gap``: what was published before that never reached this worker.
+    """
+
+    name = "redis"
+
+    # Seconds to wait before resubscribing after the connection drops
+    RECONNECT_DELAY = 1.0
+
+    PUBLISH_SCRIPT = """
+    local seq = redis.call('INCR', KEYS[1])
+    redis.call('PUBLISH', ARGV[1], seq .. '\\n' .. ARGV[2])
+    return seq
+    """
+
+    def __init__(self, url: str, channel: str):
+        self.url = url
+        self.channel = channel
+        self.epoch: Optional[str] = None
+        self._redis = None
+        self._publish_script = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Handler, on_gap: Optional[GapHandler] = None):
+        # Only needed when Redis is configured; the API does not import it otherwise
+        from redis import asyncio as aioredis
+
+        self._redis = aioredis.from_url(self.url, decode_responses=True)
+        # The first worker to start names the sequence; it lasts as long as the counter
+        await self._redis.set(f"{self.channel}:epoch", uuid.uuid4().hex, nx=True)
+        self.epoch = await self._redis.get(f"{self.channel}:epoch")
+        self._publish_script = self._redis.register_script(self.PUBLISH_SCRIPT)
+        self._listener = asyncio.create_task(self._listen(handler, on_gap))
+
+    async def _listen(self, handler: Handler, on_gap: Optional[GapHandler]):
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    # Read after subscribing, so every later payload is received
+                    seq = await self._redis.get(f"{self.channel}:seq")
+                    if on_gap is not None and seq is not None:
+                        on_gap(int(seq))
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            seq, _, payload = message["data"].partition("\n")
+                            await handler(int(seq), payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Event bus connection lost, resubscribing: {e}")
+                await asyncio.sleep(self.RECONNECT_DELAY)
+
+    async def publish(self, payload: str):
+        await self._publish_script(keys=[f"{self.channel}:seq"], args=[self.channel, payload])
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+def create_pubsub(url: str = settings.ws_pubsub_url, channel: str = settings.ws_pubsub_channel):
+    """Pick the event bus for ``url``: ``memory://`` or ``redis://``/``rediss://``."""
+    if url.startswith("memory://"):
+        return MemoryPubSub()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisPubSub(url, channel)
+    raise ValueError(f"Unsupported WS_PUBSUB_URL {url!r}, expected memory:// or redis://")
@@ -0,0 +1,145 @@
+import hashlib
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from pydantic import BaseSettings
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import RefreshToken, RevokedSession
+
+
+class RefreshTokenSettings(BaseSettings):
+    """Refresh token lifetime, read from environment variables of the same name."""
+    refresh_token_expire_days: int = 30
+    # How often each worker picks up sessions revoked by other workers
+    revocation_sync_seconds: int = 30
+
+
+settings = RefreshTokenSettings()
+
+
+def hash_token(token: str) -> str:
+    # Refresh tokens are 256 random bits, so a plain digest is as safe as bcrypt
+    # here and costs microseconds instead of ~200 ms
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def new_session_id() -> str:
+    return secrets.token_hex(16)
+
+def session_expiry(now: datetime) -> datetime:
+    return now + timedelta(days=settings.refresh_token_expire_days)
+
+
+class SessionRevocations:
+    """
+    Revoked session ids, mirrored from the ``revoked_sessions`` table.
+
+    Checked on every authenticated request, so access tokens of a revoked
+    session stop working without a query. Revocations made on this worker
+    apply at once; those made by other workers are read back every
+    ``sync_seconds``.
+    """
+
+    def __init__(self, sync_seconds: int):
+        self.sync_seconds = sync_seconds
+        self._lock = threading.Lock()
+        self._revoked: Dict[str, datetime] = {}
+        self._synced_at: Optional[datetime] = None
+        self._next_sync = 0.0
+
+    def add(self, session_id: str, expires_at: datetime):
+        with self._lock:
+            self._revoked[session_id] = expires_at
+
+    async def sync(self, db: AsyncSession):
+        self._next_sync = time.monotonic() + self.sync_seconds
+        now = datetime.utcnow()
+        query = select(RevokedSession.session_id, RevokedSession.expires_at).where(RevokedSession.expires_at > now)
+        if self._synced_at is not None:
+            # Overlap the previous sync so rows committed late, or stamped by a
+            # worker with a slightly different clock, are not missed
+            query = query.where(RevokedSession.revoked_at >= self._synced_at - timedelta(seconds=self.sync_seconds))
+        rows = (await db.execute(query)).all()
+
+        with self._lock:
+            self._revoked.update(rows)
+            for session_id in [s for s, expires_at in self._revoked.items() if expires_at <= now]:
+                del self._revoked[session_id]
+        self._synced_at = now
+
+    async def is_revoked(self, db: AsyncSession, session_id: str) -> bool:
+        if time.monotonic() >= self._next_sync:
+            await self.sync(db)
+        return session_id in self._revoked
+
+
+session_revocations = SessionRevocations(settings.revocation_sync_seconds)
+
+
+def issue_refresh_token(db: AsyncSession, user_id: int, session_id: str) -> str:
+    """Add a new refresh token for ``session_id`` to the session; the caller commits."""
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        token_hash=hash_token(token),
+        user_id=user_id,
+        session_id=session_id,
+        expires_at=session_expiry(datetime.utcnow()),
+    ))
+    return token
+
+async def find_refresh_token(db: AsyncSession, token: str) -> Optional[RefreshToken]:
+    return await db.scalar(select(RefreshToken).where(RefreshToken.token_hash == hash_token(token)))
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Optional[Tuple[RefreshToken, str]]:
+    """
+    Spend ``token`` and issue its successor in the same session.
+
+    Returns the spent row and the new token, or None if the token is
+    unknown, expired or belongs to a revoked session. A token that was
+    already spent has been copied, so its whole session is revoked. The
+    caller commits.
+    """
+    now = datetime.utcnow()
+    row = await find_refresh_token(db, token)
+    if row is None or row.expires_at <= now:
+        return None
+    if await db.get(RevokedSession, row.session_id) is not None:
+        return None
+
+    # The conditional update lets exactly one of two racing requests spend the token
+    spent = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == row.id, RefreshToken.used_at.is_(None))
+        .values(used_at=now)
+    )
+    if spent.rowcount != 1:
+        await revoke_session(db, row.session_id)
+        return None
+
+    return row, issue_refresh_token(db, row.user_id, row.session_id)
+
+async def revoke_session(db: AsyncSession, session_id: str):
+    """Revoke a login: its refresh tokens and any access tokens issued for it. The caller commits."""
+    now = datetime.utcnow()
+    expires_at = session_expiry(now)
+    if await db.get(RevokedSession, session_id) is None:
+        db.add(RevokedSession(session_id=session_id, revoked_at=now, expires_at=expires_at))
+    # Revoking too early is harmless: the session is being ended either way
+    session_revocations.add(session_id, expires_at)
+
+async def revoke_user_sessions(db: AsyncSession, user_id: int):
+    """Revoke every login of a user that still holds a live refresh token."""
+    session_ids = (await db.scalars(
+        select(RefreshToken.session_id)
+        .where(RefreshToken.user_id == user_id, RefreshToken.expires_at > datetime.utcnow())
+        .distinct()
+    )).all()
+    for session_id in session_ids:
+        await revoke_session(db, session_id)
+
+async def delete_refresh_tokens(db: AsyncSession, user_id: int):
+    await db.execute(delete(RefreshToken).where(RefreshToken.user_id == user_id))
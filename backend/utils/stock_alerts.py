@@ -0,0 +1,213 @@
+import asyncio
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, event, inspect, insert
+from sqlalchemy.orm import Session
+
+from ..database import AsyncSessionLocal
+from ..models.models import AlertKind, Ingredient, IngredientStatus, Notification, NotificationType
+from ..websocket import manager
+from .notification_reads import count_new_notifications, push_unread_counts
+
+_ALERTS_KEY = "stock_alerts"
+
+# Tells the sender task to finish and exit
+_STOP = object()
+
+
+def stock_level(quantity: Optional[float], threshold: Optional[float]) -> int:
+    """0 while stock is above its threshold, 1 at or below it, 2 when it has run out."""
+    quantity = quantity or 0
+    if quantity <= 0:
+        return 2
+    if quantity <= (threshold or 0):
+        return 1
+    return 0
+
+
+STATUS_BY_LEVEL = [IngredientStatus.AVAILABLE, IngredientStatus.LOW, IngredientStatus.OUT_OF_STOCK]
+ALERT_BY_LEVEL = [None, AlertKind.LOW_STOCK, AlertKind.OUT_OF_STOCK]
+
+
+def stock_status(quantity: Optional[float], threshold: Optional[float]) -> IngredientStatus:
+    return STATUS_BY_LEVEL[stock_level(quantity, threshold)]
+
+
+def stock_status_expr(quantity, threshold, else_=IngredientStatus.AVAILABLE.value):
+    """``stock_status`` as a SQL expression, for bulk UPDATEs."""
+    return case(
+        (quantity <= 0, IngredientStatus.OUT_OF_STOCK.value),
+        (quantity <= threshold, IngredientStatus.LOW.value),
+        else_=else_
+    )
+
+
+def record_stock_change(session, ingredient_id: int, name: str, unit: str, threshold: float, quantity: float, old_level: int):
+    """
+    Note a stock change made in this transaction. If the ingredient's
+    ``stock_level`` rose from ``old_level`` (it fell to its threshold or ran
+    out) an alert goes out once the transaction commits.
+    """
+    level = stock_level(quantity, threshold)
+    if level > old_level:
+        session.info.setdefault(_ALERTS_KEY, {})[ingredient_id] = {
+            "ingredient_id": ingredient_id,
+            "name": name,
+            "quantity": quantity,
+            "unit": unit,
+            "threshold": threshold,
+            "alert_kind": ALERT_BY_LEVEL[level].value,
+        }
+    else:
+        # Restocked later in the same transaction
+        session.info.get(_ALERTS_KEY, {}).pop(ingredient_id, None)
+
+
+# The status of an ingredient follows its quantity and threshold wherever
+# they are written; an explicitly assigned status (e.g. Expired) is kept.
+@event.listens_for(Session, "before_flush")
+def _update_stock_status(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Ingredient):
+            continue
+        state = inspect(obj)
+        if obj in session.new:
+            if obj.status is None:
+                obj.status = stock_status(obj.quantity, obj.threshold)
+        elif not state.attrs.status.history.has_changes() and (
+            state.attrs.quantity.history.has_changes() or state.attrs.threshold.history.has_changes()
+        ):
+            obj.status = stock_status(obj.quantity, obj.threshold)
+        if obj not in session.new and state.attrs.status.history.has_changes():
+            obj.status_changed_at = datetime.utcnow()
+
+
+@event.listens_for(Session, "after_flush")
+def _track_stock_transitions(session, flush_context):
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Ingredient):
+            continue
+        state = inspect(obj)
+        quantity, threshold = state.attrs.quantity.history, state.attrs.threshold.history
+        if obj in session.new:
+            old_level = 0
+        elif quantity.has_changes() or threshold.has_changes():
+            old_level = stock_level(
+                quantity.deleted[0] if quantity.deleted else obj.quantity,
+                threshold.deleted[0] if threshold.deleted else obj.threshold,
+            )
+        else:
+            continue
+        record_stock_change(session, obj.id, obj.name, obj.unit, obj.threshold, obj.quantity, old_level)
+
+
+@event.listens_for(Session, "after_commit")
+def _send_stock_alerts_on_commit(session):
+    alerts = session.info.pop(_ALERTS_KEY, None)
+    if not alerts:
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # A sync script or Celery task; the low-stock job picks these up
+        return
+    stock_alerts.submit(list(alerts.values()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_stock_alerts(session):
+    session.info.pop(_ALERTS_KEY, None)
+
+
+def alert_message(alert: dict) -> str:
+    status_text = "out of stock" if alert["alert_kind"] == AlertKind.OUT_OF_STOCK.value else "low"
+    return f"{alert['name']} is {status_text}. Current quantity: {alert['quantity']} {alert['unit']}"
+
+
+class StockAlertSender:
+    """
+    Stores and pushes the alerts raised by committed stock changes.
+
+    Each alert is stored as one broadcast notification and sent as an
+    ``inventory_alert`` event on the inventory topic. It runs in a
+    background task so the request that changed the stock does not wait
+    for it.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.failed = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "sent": self.sent,
+            "failed": self.failed,
+        }
+
+    def submit(self, alerts: List[dict]):
+        """Queue alerts for sending; never blocks."""
+        if self._task is None:
+            # Started on first use so it runs on the server's event loop
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        self._queue.put_nowait(alerts)
+
+    async def _run(self):
+        queue = self._queue
+        while True:
+            alerts = await queue.get()
+            if alerts is _STOP:
+                break
+            await self._send(alerts)
+
+    async def _send(self, alerts: List[dict]):
+        now = datetime.utcnow()
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(Notification), [
+                    {
+                        "user_id": None,
+                        "message": alert_message(alert),
+                        "notification_type": NotificationType.INVENTORY_ALERT.value,
+                        "is_read": False,
+                        "created_at": now,
+                        "updated_at": now,
+                        "ingredient_id": alert["ingredient_id"],
+                        "alert_kind": alert["alert_kind"],
+                    }
+                    for alert in alerts
+                ])
+                await count_new_notifications(db, [None] * len(alerts))
+                await db.commit()
+                await push_unread_counts(db, [None])
+        except Exception as e:
+            self.failed += len(alerts)
+            print(f"Error saving stock alerts: {e}")
+
+        for alert in alerts:
+            await manager.broadcast(json.dumps({
+                "type": NotificationType.INVENTORY_ALERT.value,
+                "message": alert_message(alert),
+                "data": alert,
+                "timestamp": now.isoformat()
+            }), topic="inventory", save_to_db=False)
+            self.sent += 1
+
+    async def stop(self):
+        """Send every queued alert, then stop the task until the next submit."""
+        if self._task is None:
+            return
+        task, queue = self._task, self._queue
+        self._task = None
+        queue.put_nowait(_STOP)
+        await task
+        if self._queue is queue:
+            self._queue = None
+
+
+stock_alerts = StockAlertSender()
@@ -1,94 +1,606 @@
-from fastapi import WebSocket, WebSocketDisconnect
-from typing import List, Dict, Any
+from fastapi import WebSocket, WebSocketDisconnect, status
+from starlette.websockets import WebSocketState
+from pydantic import BaseSettings
+from typing import Callable, Hashable, Iterable, List, Dict, Any, Optional, Set, Union
+import asyncio
 import json
-from datetime import datetime
-from sqlalchemy.orm import Session
-from .database import SessionLocal
-from .models.models import Notification, User
+import time
+import uuid
+from .models.models import UserRole
+from .utils.event_log import create_event_log
+from .utils.notification_writer import notification_writer
+from .utils.pubsub import create_pubsub
+
+
+class WebSocketSettings(BaseSettings):
+    """Outbound WebSocket limits, read from environment variables of the same name."""
+    # Messages a client may fall behind by before it is disconnected
+    ws_send_queue_size: int = 256
+    # Seconds a single send may take before the client is disconnected
+    ws_send_timeout: float = 5.0
+    # Topic events published within this window go out as one frame; 0 sends each at once
+    ws_coalesce_ms: int = 50
+    # Commands a client may send per second on average, in bursts of up to
+    # ws_command_burst; frames beyond that, or larger than
+    # ws_command_max_bytes, are dropped unread
+    ws_command_rate: float = 5.0
+    ws_command_burst: int = 20
+    ws_command_max_bytes: int = 4096
+
+
+settings = WebSocketSettings()
+
+try:
+    import msgpack
+except ImportError:  # optional; clients that ask for it get JSON instead
+    msgpack = None
+
+# Frame encodings a client may ask for with ?encoding=
+ENCODINGS = ("json", "msgpack") if msgpack is not None else ("json",)
+
+# Queued after the pending messages of a client being evicted
+_CLOSE = object()
+
+
+class Frame:
+    """
+    One outgoing message, shared by every client that receives it.
+
+    Each encoding is produced at most once per frame, however many clients
+    ask for it.
+    """
+
+    __slots__ = ("text", "data", "_msgpack")
+
+    def __init__(self, text: str, data: Any = None):
+        self.text = text
+        # The decoded ``text``, when the sender already has it
+        self.data = data
+        self._msgpack: Optional[bytes] = None
+
+    def encode(self, encoding: str) -> Union[str, bytes]:
+        if encoding != "msgpack":
+            return self.text
+        if self._msgpack is None:
+            try:
+                self._msgpack = msgpack.packb(self.data if self.data is not None else json.loads(self.text))
+            except ValueError:
+                # Not JSON, so there is nothing to pack
+                return self.text
+        return self._msgpack
+
+# Event topics and the roles that may follow them. Every user may also
+# follow their own notifications:user:{id} topic.
+TOPIC_ROLES = {
+    "inventory": {UserRole.ADMIN.value, UserRole.COOK.value, UserRole.MANAGER.value},
+    "meals": {UserRole.ADMIN.value, UserRole.COOK.value},
+    "orders": {UserRole.ADMIN.value, UserRole.MANAGER.value},
+    "notifications": {UserRole.ADMIN.value, UserRole.COOK.value, UserRole.MANAGER.value},
+}
+USER_TOPIC_PREFIX = "notifications:user:"
+# Bus targets carrying cache invalidations between workers rather than client events
+CACHE_TARGET_PREFIX = "cache:"
+
+def user_topic(user_id: int) -> str:
+    return f"{USER_TOPIC_PREFIX}{user_id}"
+
+def can_subscribe(user, topic: str) -> bool:
+    if topic in TOPIC_ROLES:
+        return user.role in TOPIC_ROLES[topic]
+    if topic.startswith(USER_TOPIC_PREFIX):
+        return topic == user_topic(user.id) or user.role == UserRole.ADMIN
+    return False
+
+def default_topics(user) -> Set[str]:
+    """Everything the user's role may follow, plus their own notifications."""
+    topics = {topic for topic, roles in TOPIC_ROLES.items() if user.role in roles}
+    topics.add(user_topic(user.id))
+    return topics
+
+
+class TokenBucket:
+    """Allows ``rate`` actions a second on average, in bursts of up to ``burst``."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Connection:
+    """
+    An accepted socket with its own bounded outbound queue.
+
+    A writer task drains the queue, so a client on a slow network only ever
+    delays its own messages.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user_id: Optional[int],
+        queue_size: int,
+        encoding: str = "json",
+        command_rate: float = settings.ws_command_rate,
+        command_burst: int = settings.ws_command_burst,
+    ):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.encoding = encoding
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.closing = False
+        self.topics: Set[str] = set()
+        self.commands = TokenBucket(command_rate, command_burst)
+        # Highest sequence number the client has acknowledged
+        self.acked_seq = 0
+
+    def enqueue(self, frame: Frame) -> bool:
+        """Queue a frame without waiting; False if the client is too far behind."""
+        if self.closing:
+            return True
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close_soon(self):
+        """Drop what the client has not received yet and close the socket from the writer."""
+        self.closing = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_CLOSE)
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.user_connections: Dict[int, List[WebSocket]] = {}  # Map user_id to their connections
-
-    async def connect(self, websocket: WebSocket, user_id: int = None):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        
+    def __init__(
+        self,
+        queue_size: int = settings.ws_send_queue_size,
+        send_timeout: float = settings.ws_send_timeout,
+        coalesce_ms: int = settings.ws_coalesce_ms,
+        pubsub=None,
+        event_log=None,
+        command_rate: float = settings.ws_command_rate,
+        command_burst: int = settings.ws_command_burst,
+        command_max_bytes: int = settings.ws_command_max_bytes,
+    ):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.coalesce_ms = coalesce_ms
+        self.command_rate = command_rate
+        self.command_burst = command_burst
+        self.command_max_bytes = command_max_bytes
+        # Per topic, messages waiting for the coalescing window to close, by key
+        self._pending: Dict[str, Dict[Hashable, str]] = {}
+        self._pending_seq = 0
+        self._flushes: Set[asyncio.Task] = set()
+        # Carries every broadcast to every worker, this one included
+        self.pubsub = pubsub or create_pubsub()
+        self._pubsub_started = False
+        # Set by shutdown; later broadcasts are dropped rather than reopening the bus
+        self._closed = False
+        # Per cache name, what drops an entry when another worker invalidates it
+        self.worker_id = uuid.uuid4().hex
+        self._cache_handlers: Dict[str, Callable[[str], None]] = {}
+        self._invalidations: Set[asyncio.Task] = set()
+        # Delivered events by sequence number, replayed to resuming clients
+        self.event_log = event_log or create_event_log()
+        self.connections: Dict[WebSocket, Connection] = {}
+        self.user_connections: Dict[int, List[Connection]] = {}  # Map user_id to their connections
+        self.topics: Dict[str, Set[Connection]] = {}  # Map topic to its subscribers
+        self.sent = 0
+        self.bytes_sent = 0
+        self.coalesced = 0
+        self.evicted = 0
+        self.replayed = 0
+        self.resyncs = 0
+        self.commands = 0
+        self.commands_dropped = 0
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.connections)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pubsub": self.pubsub.name,
+            "connections": len(self.connections),
+            "topics": len(self.topics),
+            "queued": sum(connection.queue.qsize() for connection in self.connections.values()),
+            "max_queue": self.queue_size,
+            "sent": self.sent,
+            "bytes_sent": self.bytes_sent,
+            "coalesced": self.coalesced,
+            "evicted": self.evicted,
+            "last_seq": self.event_log.last_seq,
+            "replayed": self.replayed,
+            "resyncs": self.resyncs,
+            "commands": self.commands,
+            "commands_dropped": self.commands_dropped,
+        }
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        user_id: int = None,
+        topics: Iterable[str] = (),
+        encoding: str = "json",
+        last_seq: Optional[int] = None,
+        epoch: Optional[str] = None,
+    ):
+        """
+        Register a socket and greet it with a ``subscribed`` frame.
+
+        A client that passes the ``epoch`` and ``last_seq`` it saw before
+        reconnecting first receives the events it missed on its topics,
+        or ``resync_required`` if they are no longer kept.
+        """
+        if websocket.client_state == WebSocketState.CONNECTING:
+            await websocket.accept()
+        # No awaits from here on: the replay and the live events that follow
+        # it reach the queue in sequence order, without gaps or duplicates
+        connection = Connection(websocket, user_id, self.queue_size, encoding, self.command_rate, self.command_burst)
+        self.connections[websocket] = connection
+        self.subscribe(websocket, topics)
+
         # If user_id is provided, add to user_connections
         if user_id:
             if user_id not in self.user_connections:
                 self.user_connections[user_id] = []
-            self.user_connections[user_id].append(websocket)
+            self.user_connections[user_id].append(connection)
+
+        self._enqueue(connection, self._subscribed_frame(connection))
+        if last_seq is not None:
+            self._replay(connection, last_seq, epoch)
+
+        connection.writer = asyncio.create_task(self._write(connection))
+
+    def _subscribed_frame(self, connection: Connection) -> Frame:
+        return Frame(json.dumps({
+            "type": "subscribed",
+            "topics": sorted(connection.topics),
+            "encoding": connection.encoding,
+            "epoch": self.pubsub.epoch,
+            "seq": self.event_log.last_seq,
+        }))
+
+    def _replay(self, connection: Connection, last_seq: int, epoch: Optional[str]):
+        events = self.event_log.since(last_seq) if epoch == self.pubsub.epoch else None
+        if events is None:
+            self.resyncs += 1
+            self._enqueue(connection, Frame(json.dumps({
+                "type": "resync_required",
+                "epoch": self.pubsub.epoch,
+                "seq": self.event_log.last_seq,
+            })))
+            return
+        for seq, target, text in events:
+            if self._matches(connection, target):
+                self.replayed += 1
+                self._enqueue(connection, Frame(text))
+
+    @staticmethod
+    def _matches(connection: Connection, target: str) -> bool:
+        if target == "*":
+            return True
+        if target.startswith("user:"):
+            return connection.user_id == int(target[len("user:"):])
+        return target[len("topic:"):] in connection.topics
+
+    def handle_command(self, websocket: WebSocket, user, data: str):
+        """
+        Carry out one frame sent by a client.
+
+        Commands are JSON objects with a ``type``:
+
+        - ``{"type": "ping"}``: answered with ``pong``
+        - ``{"type": "subscribe" | "unsubscribe", "topics": [...]}``:
+          changes the subscription, answered with ``subscribed``
+        - ``{"type": "ack", "seq": N}``: the client has handled events up to ``N``
+        - ``{"type": "resume", "last_seq": N, "epoch": "..."}``: sends the
+          events after ``N`` again (after the last ``ack`` if ``last_seq``
+          is left out), or ``resync_required``
+
+        Anything else, and anything beyond the connection's rate limit, is
+        dropped without a reply, so no client frame is ever passed on to
+        other clients or stored.
+        """
+        connection = self.connections.get(websocket)
+        if connection is None or connection.closing:
+            return
+        if len(data) > self.command_max_bytes or not connection.commands.take():
+            self.commands_dropped += 1
+            return
+        try:
+            command = json.loads(data)
+            kind = command.get("type")
+        except (ValueError, AttributeError):
+            kind = None
+
+        if kind == "ping":
+            self._enqueue(connection, Frame(json.dumps({"type": "pong", "seq": self.event_log.last_seq})))
+        elif kind in ("subscribe", "unsubscribe") and isinstance(command.get("topics"), list):
+            topics = [topic for topic in command["topics"] if isinstance(topic, str)]
+            if kind == "subscribe":
+                self.subscribe(websocket, [topic for topic in topics if can_subscribe(user, topic)])
+            else:
+                self.unsubscribe(websocket, topics)
+            self._enqueue(connection, self._subscribed_frame(connection))
+        elif kind == "ack" and isinstance(command.get("seq"), int):
+            connection.acked_seq = max(connection.acked_seq, command["seq"])
+        elif kind == "resume":
+            last_seq = command.get("last_seq")
+            if not isinstance(last_seq, int):
+                last_seq = connection.acked_seq
+            # Events already received may come again; clients skip seqs they have seen
+            self._replay(connection, last_seq, command.get("epoch", self.pubsub.epoch))
+        else:
+            self.commands_dropped += 1
+            return
+        self.commands += 1
+
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str]):
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return
+        for topic in topics:
+            connection.topics.add(topic)
+            self.topics.setdefault(topic, set()).add(connection)
+
+    def unsubscribe(self, websocket: WebSocket, topics: Iterable[str]):
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return
+        for topic in topics:
+            connection.topics.discard(topic)
+            subscribers = self.topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self.topics[topic]
+
+    def _remove(self, connection: Connection):
+        if self.connections.get(connection.websocket) is not connection:
+            return
+        self.unsubscribe(connection.websocket, list(connection.topics))
+        self.connections.pop(connection.websocket, None)
 
-    def disconnect(self, websocket: WebSocket, user_id: int = None):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        
         # Remove from user_connections if applicable
+        user_id = connection.user_id
         if user_id and user_id in self.user_connections:
-            if websocket in self.user_connections[user_id]:
-                self.user_connections[user_id].remove(websocket)
-            
+            if connection in self.user_connections[user_id]:
+                self.user_connections[user_id].remove(connection)
+
             # Clean up empty lists
             if not self.user_connections[user_id]:
                 del self.user_connections[user_id]
 
+    def disconnect(self, websocket: WebSocket, user_id: int = None):
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return
+        self._remove(connection)
+        # The client is gone; nothing left in its queue can be delivered
+        if connection.writer is not None:
+            connection.writer.cancel()
+
+    def _evict(self, connection: Connection):
+        """Disconnect a client whose queue is full instead of buffering for it without bound."""
+        self.evicted += 1
+        self._remove(connection)
+        connection.close_soon()
+
+    def _enqueue(self, connection: Connection, frame: Frame):
+        if not connection.enqueue(frame):
+            self._evict(connection)
+
+    async def _write(self, connection: Connection):
+        """Send the connection's queued messages in order until it closes or stalls."""
+        websocket = connection.websocket
+        try:
+            while True:
+                frame = await connection.queue.get()
+                if frame is _CLOSE:
+                    break
+                data = frame.encode(connection.encoding)
+                if isinstance(data, bytes):
+                    await asyncio.wait_for(websocket.send_bytes(data), self.send_timeout)
+                else:
+                    await asyncio.wait_for(websocket.send_text(data), self.send_timeout)
+                self.sent += 1
+                self.bytes_sent += len(data)
+        except asyncio.CancelledError:
+            return
+        except asyncio.TimeoutError:
+            if not connection.closing:
+                self.evicted += 1
+        except Exception as e:
+            print(f"Error sending message: {e}")
+
+        # Stalled, failed or evicted: stop routing messages here and tell the
+        # client to reconnect
+        self._remove(connection)
+        connection.closing = True
+        try:
+            await asyncio.wait_for(websocket.close(code=status.WS_1013_TRY_AGAIN_LATER), self.send_timeout)
+        except Exception:
+            pass
+
     async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+        connection = self.connections.get(websocket)
+        if connection is not None:
+            self._enqueue(connection, Frame(message))
+
+    async def start(self):
+        """Subscribe to the event bus; called at startup, or by the first broadcast."""
+        self._closed = False
+        if not self._pubsub_started:
+            self._pubsub_started = True
+            await self.pubsub.start(self._deliver, self.event_log.lose)
+
+    async def _publish(self, target: str, message: str):
+        # "<target>\n<message>" rather than a JSON envelope, so the message is
+        # not escaped and parsed again on every worker
+        if self._closed:
+            return
+        if not self._pubsub_started:
+            await self.start()
+        await self.pubsub.publish(f"{target}\n{message}")
+
+    async def _deliver(self, seq: int, payload: str):
+        """Log a bus payload and fan it out to this worker's matching connections."""
+        target, _, message = payload.partition("\n")
+        if target.startswith(CACHE_TARGET_PREFIX):
+            origin, _, key = message.partition(" ")
+            handler = self._cache_handlers.get(target[len(CACHE_TARGET_PREFIX):])
+            # The worker that invalidated has already dropped its own copy
+            if handler is not None and origin != self.worker_id:
+                handler(key)
+            # Numbered like an event, so the log must know nothing was skipped
+            self.event_log.skip(seq)
+            return
+        # The bus numbers an event after it is published, so the sequence
+        # number is added here: once per event on each worker, not per client
+        try:
+            event = json.loads(message)
+        except ValueError:
+            event = None
+        if isinstance(event, dict):
+            event.pop("seq", None)
+            event = {"seq": seq, **event}
+            message = json.dumps(event)
+        else:
+            event = None
+        self.event_log.append(seq, target, message)
+        if target == "*":
+            recipients = list(self.connections.values())
+        elif target.startswith("user:"):
+            recipients = list(self.user_connections.get(int(target[len("user:"):]), ()))
+        else:
+            recipients = list(self.topics.get(target[len("topic:"):], ()))
+        frame = Frame(message, event)
+        for connection in recipients:
+            self._enqueue(connection, frame)
+
+    def _coalesce(self, topic: str, message: str, key: Optional[Hashable]):
+        pending = self._pending.get(topic)
+        if pending is None:
+            pending = self._pending[topic] = {}
+            flush = asyncio.create_task(self._flush_later(topic))
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+        if key is None:
+            self._pending_seq += 1
+            key = (None, self._pending_seq)
+        elif key in pending:
+            # Only the entity's latest state is sent, in the position of its latest change
+            del pending[key]
+            self.coalesced += 1
+        pending[key] = message
+
+    async def _flush_later(self, topic: str):
+        await asyncio.sleep(self.coalesce_ms / 1000)
+        await self._flush(topic)
+
+    async def _flush(self, topic: str):
+        messages = list(self._pending.pop(topic, {}).values())
+        if not messages:
+            return
+        if len(messages) == 1:
+            frame = messages[0]
+        else:
+            # Joined as text: each message was serialized once by its sender
+            frame = '{"type": "delta", "topic": %s, "events": [%s]}' % (json.dumps(topic), ", ".join(messages))
+        await self._publish(f"topic:{topic}", frame)
+
+    def on_invalidate(self, cache: str, handler: Callable[[str], None]):
+        """Call ``handler(key)`` on this worker whenever another worker invalidates ``key`` in ``cache``."""
+        self._cache_handlers[cache] = handler
+
+    async def invalidate(self, cache: str, key: str = ""):
+        """
+        Have the other workers drop ``key`` from ``cache``.
+
+        Callers drop their own copy themselves, so a request never waits on
+        the bus to read its own writes.
+        """
+        await self._publish(f"{CACHE_TARGET_PREFIX}{cache}", f"{self.worker_id} {key}")
+
+    def invalidate_soon(self, cache: str, key: str = ""):
+        """``invalidate`` from synchronous code such as Session events."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # A sync script or Celery task; API workers are not told
+            return
+        task = asyncio.create_task(self.invalidate(cache, key))
+        self._invalidations.add(task)
+        task.add_done_callback(self._invalidations.discard)
 
     async def send_to_user(self, message: str, user_id: int):
         """Send a message to a specific user via all their connections."""
-        if user_id in self.user_connections:
-            for connection in self.user_connections[user_id]:
-                await connection.send_text(message)
+        await self._publish(f"user:{user_id}", message)
 
-    async def broadcast(self, message: str, save_to_db: bool = True):
+    async def broadcast(self, message: str, topic: Optional[str] = None, save_to_db: bool = True, key: Optional[Hashable] = None):
         """
-        Broadcast a message to all connected clients.
+        Broadcast a message to the clients subscribed to ``topic``, or to
+        every client when no topic is given.
         Optionally save the message to the database.
+
+        Topic messages are held for ``coalesce_ms`` and everything published
+        on the topic in that window goes out as one ``delta`` frame. A later
+        message with the same ``key`` (e.g. ``"ingredient:3"``) replaces the
+        earlier one, so a burst of updates to one entity sends its final state.
+
+        The message is published once on the event bus and every worker
+        queues it for its own matching clients. Sending only queues the
+        message for each client's writer task, and saving only queues it for
+        the notification writer, so the caller never waits on a client's
+        network or on the database.
         """
-        # Send to all active connections
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                print(f"Error sending message: {e}")
-        
-        # Save to database if requested
+        if topic is None:
+            await self._publish("*", message)
+        elif self.coalesce_ms > 0:
+            self._coalesce(topic, message, key)
+        else:
+            await self._publish(f"topic:{topic}", message)
+
+        # Stored in the background, batched with other notifications, by the
+        # worker that published it only
         if save_to_db:
-            try:
-                # Parse the message
-                data = json.loads(message)
-                
-                # Create a database session
-                db = SessionLocal()
-                try:
-                    # Determine user_id (if any)
-                    user_id = data.get('data', {}).get('user_id')
-                    
-                    # Get the sender information
-                    sender_id = None
-                    sender_name = "System"
-                    if 'user' in data:
-                        sender_id = data['user'].get('id')
-                        sender_name = data['user'].get('name', 'System')
-                    
-                    # Create notification
-                    notification = Notification(
-                        user_id=user_id,  # Can be None for broadcast to all
-                        message=data.get('message', 'New notification'),
-                        notification_type=data.get('type', 'system'),
-                        is_read=False,
-                        created_by=sender_id,
-                        created_at=datetime.utcnow()
-                    )
-                    
-                    db.add(notification)
-                    db.commit()
-                finally:
-                    db.close()
-            except Exception as e:
-                print(f"Error saving notification to database: {e}")
+            notification_writer.submit(message)
+
+    async def shutdown(self):
+        # Hand what is still being coalesced to the bus for the other workers
+        for flush in list(self._flushes):
+            flush.cancel()
+        for topic in list(self._pending):
+            await self._flush(topic)
+        if self._invalidations:
+            await asyncio.gather(*self._invalidations, return_exceptions=True)
+        self._closed = True
+        for connection in list(self.connections.values()):
+            if connection.writer is not None:
+                connection.writer.cancel()
+        self.connections.clear()
+        self.user_connections.clear()
+        self.topics.clear()
+        if self._pubsub_started:
+            self._pubsub_started = False
+            await self.pubsub.stop()
+        self.event_log.close()
 
 manager = ConnectionManager()
@@ -3,6 +3,7 @@
 # Initialize the database
 cd /app/backend
 python init_db.py
+python -m alembic upgrade head
 
 # Start the backend server
 uvicorn main:app --host 0.0.0.0 --port 8000 &